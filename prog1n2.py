@@ -1,8 +1,140 @@
+import argparse
+import math
+import mmap
+import os
 import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ttt_instrument import instrument_functions
+from ttt_records import MODE_QUBIC, MODE_ULTIMATE, record_game
+
+try:
+    import numpy as np
+except ImportError:  # Only the batch evaluator needs NumPy
+    np = None
+
+# Bitboards: cell (row, col) is bit row * 3 + col, one 9-bit mask per player
+CELL_BITS = tuple(1 << i for i in range(9))
+FULL_BOARD = 0b111111111
+# (x_bits, o_bits) of one board row, shifted into place by board_to_bits
+ROW_BITS = {(a, b, c): (sum(1 << j for j, v in enumerate((a, b, c)) if v == 1),
+                        sum(1 << j for j, v in enumerate((a, b, c)) if v == 2))
+            for a in range(3) for b in range(3) for c in range(3)}
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,  # Rows
+    0b001001001, 0b010010010, 0b100100100,  # Columns
+    0b100010001, 0b001010100                # Diagonals
+)
+
+def _build_tables():
+    """Precompute per-mask lookups so bitboard queries are a single index"""
+    is_win = [any(mask & m == m for m in WIN_MASKS) for mask in range(512)]
+    # Cells that would complete a line for the owner of the mask
+    threats = []
+    for mask in range(512):
+        t = 0
+        for m in WIN_MASKS:
+            if bin(mask & m).count("1") == 2:
+                t |= m & ~mask
+        threats.append(t)
+    cells = [tuple(i for i in range(9) if mask & CELL_BITS[i]) for mask in range(512)]
+    lowest = [c[0] if c else -1 for c in cells]
+    return tuple(is_win), tuple(threats), tuple(cells), tuple(lowest)
+
+IS_WIN, THREATS, MASK_CELLS, LOWEST_CELL = _build_tables()
+LINE_CELLS = tuple(MASK_CELLS[m] for m in WIN_MASKS)
+LINE_NAMES = ("top row", "mid row", "bottom row", "left column", "mid column",
+              "right column", "diagonal", "anti-diagonal")
+CELL_LINES = tuple(tuple(l for l in range(8) if i in LINE_CELLS[l]) for i in range(9))
+# Union of the cells of every subset of the 8 lines, indexed by line bitmask
+LINE_SET_CELLS = tuple(
+    sum(1 << i for i in range(9) if any(s >> l & 1 and i in LINE_CELLS[l] for l in range(8)))
+    for s in range(256))
+
+# Solved-game table: one byte per canonical base-3 index, value << 4 | best cell
+POW3 = tuple(3 ** i for i in range(9))
+TERNARY = tuple(sum(POW3[i] for i in MASK_CELLS[mask]) for mask in range(512))
+TABLE_SIZE = 3 ** 9
+VALUE_LOSS = 0
+VALUE_DRAW = 1
+VALUE_WIN = 2
+NO_MOVE = 0x0F
+UNREACHABLE = 0xFF
+SOLVED_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ttt_solved.bin")
+_solved_table = None
+
+def _build_symmetries():
+    """Cell permutations for the 8 rotations/reflections and their mask tables"""
+    rotate = tuple((i % 3) * 3 + 2 - i // 3 for i in range(9))
+    mirror = tuple((i // 3) * 3 + 2 - i % 3 for i in range(9))
+    perms = []
+    perm = tuple(range(9))
+    for _ in range(4):
+        perms.append(perm)
+        perms.append(tuple(mirror[perm[i]] for i in range(9)))
+        perm = tuple(rotate[perm[i]] for i in range(9))
+    inverses = []
+    for perm in perms:
+        inv = [0] * 9
+        for i in range(9):
+            inv[perm[i]] = i
+        inverses.append(tuple(inv))
+    masks = tuple(tuple(sum(CELL_BITS[perm[i]] for i in MASK_CELLS[mask]) for mask in range(512))
+                  for perm in perms)
+    return tuple(perms), tuple(inverses), masks
+
+# SYMMETRIES[s][cell] is where cell lands under symmetry s
+SYMMETRIES, INVERSE_SYMMETRIES, SYMMETRY_MASKS = _build_symmetries()
+# Probes of the caches keyed on the canonical index: the solver memo while
+# building the table and the get_move_values_bits cache
+CACHE_STATS = {"hits": 0, "misses": 0}
+_move_values_cache = {}  # Canonical index -> move values in the canonical frame
+_table_coverage = None  # (canonical, raw) reachable positions, see get_cache_stats
+
+# General n x n, k-in-a-row engine
+MAX_ENGINE_SIZE = 7
+WIN_SCORE = 1000000
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+# 4x4 tablebase: 2 bits per base-3 index, built by ttt_tablebase.py
+TB_LOSS = 1
+TB_DRAW = 2
+TB_WIN = 3
+_tablebases = {}
+
+# Ultimate tic-tac-toe MCTS
+UCT_EXPLORATION = 1.4
+_mcts_pool = None
+
+# Qubic (4x4x4): cell layer * 16 + row * 4 + col, one 64-bit mask per player
+QUBIC_CELLS = 64
+QUBIC_TIME_LIMIT = 2.0
+
+def _build_qubic_lines():
+    """The 76 four-in-a-row lines of the cube as 64-bit masks"""
+    lines = set()
+    directions = [(dl, dr, dc) for dl in (-1, 0, 1) for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+                  if (dl, dr, dc) != (0, 0, 0)]
+    for layer in range(4):
+        for row in range(4):
+            for col in range(4):
+                for dl, dr, dc in directions:
+                    end = (layer + 3 * dl, row + 3 * dr, col + 3 * dc)
+                    if all(0 <= v < 4 for v in end):
+                        lines.add(sum(1 << ((layer + i * dl) * 16 + (row + i * dr) * 4 + col + i * dc)
+                                      for i in range(4)))
+    return tuple(sorted(lines))
+
+QUBIC_LINES = _build_qubic_lines()
 
 def main():
     ply = 1
     player = {"1": 0, "2": 0}
+    game = GameState()
     b = [
         [0, 0, 0],
         [0, 0, 0],
@@ -12,7 +144,15 @@ def main():
     print("Choose game mode:")
     print("1. Human vs Human")
     print("2. Human vs Computer")
+    print("3. Ultimate Tic-Tac-Toe vs Computer")
+    print("4. Qubic (4x4x4) vs Computer")
     mode = int(input("Enter choice: "))
+    if mode == 3:
+        play_ultimate()
+        return
+    if mode == 4:
+        play_qubic()
+        return
 
     while True:
         if ply == 1:
@@ -28,7 +168,8 @@ def main():
                 move = input("Player two make a move: ")
             else:
                 print("Computer's turn")
-                move = get_computer_move(b)
+                cell = get_computer_move_bits(game.bits[1], game.bits[0])
+                move = convert_to_text(cell // 3, cell % 3)
 
         # Convert move to coordinates
         row, col = convert_move(move)
@@ -39,8 +180,9 @@ def main():
             continue
 
         # Make move
-        if b[row][col] == 0:
+        if game.is_empty(row * 3 + col):
             b[row][col] = ply
+            game.make(row * 3 + col)
         else:
             print("Invalid move! That space is already taken.")
             continue
@@ -65,7 +207,7 @@ def main():
                 print("-------------")
 
         # Call winner function
-        winner = check_winner(b)
+        winner = game.winner
 
         if winner:
             if winner == 1:
@@ -74,103 +216,227 @@ def main():
                 print("Player 2 wins!")
             else:
                 print("Cat game!")
+            record_game(mode, winner, game.moves)
             break
 
         # Switch players
         ply = 2 if ply == 1 else 1
 
+# Words accepted by convert_move for each coordinate
+ROW_TOKENS = {
+    "top": 0, "upper": 0, "up": 0,
+    "mid": 1, "middle": 1, "center": 1, "centre": 1,
+    "bottom": 2, "bot": 2, "down": 2, "lower": 2
+}
+COL_TOKENS = {
+    "left": 0, "l": 0,
+    "mid": 1, "middle": 1, "center": 1, "centre": 1,
+    "right": 2, "r": 2
+}
+
 def convert_move(move):
     """Convert text move to row, col coordinates"""
-    text = move.lower().strip()
-    tokens = text.split()
     row = -1
     col = -1
-
-    row_map = {
-        "top": 0, "upper": 0, "up": 0,
-        "mid": 1, "middle": 1, "center": 1, "centre": 1,
-        "bottom": 2, "bot": 2, "down": 2, "lower": 2
-    }
-    col_map = {
-        "left": 0, "l": 0,
-        "mid": 1, "middle": 1, "center": 1, "centre": 1,
-        "right": 2, "r": 2
-    }
-
-    for tok in tokens:
-        if row == -1 and tok in row_map:
-            row = row_map[tok]
+    for tok in move.lower().split():
+        if row == -1 and tok in ROW_TOKENS:
+            row = ROW_TOKENS[tok]
             continue
-        if col == -1 and tok in col_map:
-            col = col_map[tok]
+        if col == -1 and tok in COL_TOKENS:
+            col = COL_TOKENS[tok]
             continue
 
     return row, col
 
 def check_winner(b):
-    # Check rows
-    for i in range(3):
-        if b[i][0] == b[i][1] == b[i][2] != 0:
-            return b[i][0]
-    # Column check
-    for j in range(3):
-        if b[0][j] == b[1][j] == b[2][j] != 0:
-            return b[0][j]
-    # Check diagonals
-    if b[0][0] == b[1][1] == b[2][2] != 0:
-        return b[0][0]
-    if b[0][2] == b[1][1] == b[2][0] != 0:
-        return b[1][1]
-
-    # Check for draw
-    if all(b[i][j] != 0 for i in range(3) for j in range(3)):
-        return 3  # Draw
-    return 0  # No winner
+    """Return 1 or 2 for a winner, 3 for a draw, 0 while the game is ongoing
+
+    Converting the list board dominates the cost; bulk callers should keep
+    bitboards and use check_winner_bits / get_winning_cell directly.
+    """
+    return check_winner_bits(*board_to_bits(b))
 
 def get_winning_move(b, player):
     """Find winning move for player"""
-    # Check rows
-    for i in range(3):
-        row = b[i]
-        if row.count(player) == 2 and 0 in row:
-            return (i, row.index(0))
-
-    # Check columns
-    for j in range(3):
-        col = [b[i][j] for i in range(3)]
-        if col.count(player) == 2 and 0 in col:
-            return (col.index(0), j)
-
-    # Check diagonals
-    diag = [b[i][i] for i in range(3)]
-    if diag.count(player) == 2 and 0 in diag:
-        idx = diag.index(0)
-        return (idx, idx)
-
-    anti_diag = [b[i][2 - i] for i in range(3)]
-    if anti_diag.count(player) == 2 and 0 in anti_diag:
-        idx = anti_diag.index(0)
-        return (idx, 2 - idx)
-    return None
+    x_bits, o_bits = board_to_bits(b)
+    own, other = (x_bits, o_bits) if player == 1 else (o_bits, x_bits)
+    cell = get_winning_cell(own, other)
+    if cell == -1:
+        return None
+    return (cell // 3, cell % 3)
+
+def evaluate_boards(boards, chunk_size=1 << 20):
+    """Classify an (N, 9) int8 array of boards in bulk
+
+    Returns (status, to_move, win_cell, block_cell) arrays of length N:
+    status uses the check_winner codes, to_move is the player on turn, and
+    win_cell/block_cell are the immediate winning and blocking cells for
+    that player (-1 if none or the game is over).
+    """
+    if np is None:
+        raise RuntimeError("evaluate_boards requires NumPy")
+    boards = np.asarray(boards)
+    if boards.ndim != 2 or boards.shape[1] != 9:
+        raise ValueError(f"Expected an (N, 9) array, got shape {boards.shape}")
+    n = len(boards)
+    status = np.empty(n, dtype=np.int8)
+    to_move = np.empty(n, dtype=np.int8)
+    win_cell = np.empty(n, dtype=np.int8)
+    block_cell = np.empty(n, dtype=np.int8)
+    lines = np.array(LINE_CELLS)
+
+    # Work in chunks so temporaries stay bounded for huge inputs
+    for start in range(0, n, chunk_size):
+        chunk = boards[start:start + chunk_size]
+        x = chunk == 1
+        o = chunk == 2
+        empty = chunk == 0
+        x_lines = x[:, lines].sum(axis=2, dtype=np.int8)
+        o_lines = o[:, lines].sum(axis=2, dtype=np.int8)
+
+        x_turn = x.sum(axis=1) == o.sum(axis=1)
+        result = np.zeros(len(chunk), dtype=np.int8)
+        result[~empty.any(axis=1)] = 3  # Draw
+        result[(o_lines == 3).any(axis=1)] = 2
+        result[(x_lines == 3).any(axis=1)] = 1
+        ongoing = result == 0
+
+        own_lines = np.where(x_turn[:, None], x_lines, o_lines)
+        other_lines = np.where(x_turn[:, None], o_lines, x_lines)
+        end = start + len(chunk)
+        for out, attack, defend in ((win_cell, own_lines, other_lines),
+                                    (block_cell, other_lines, own_lines)):
+            # A line is a threat with two marks and no opposing mark
+            threat = (attack == 2) & (defend == 0)
+            cells = np.empty_like(empty)
+            for i in range(9):
+                cells[:, i] = threat[:, CELL_LINES[i]].any(axis=1)
+            cells &= empty
+            found = cells.any(axis=1) & ongoing
+            out[start:end] = np.where(found, cells.argmax(axis=1), -1)
+
+        status[start:end] = result
+        to_move[start:end] = np.where(x_turn, 1, 2)
+    return status, to_move, win_cell, block_cell
 
 def get_computer_move(b):
     """Get computer move with strategy"""
+    x_bits, o_bits = board_to_bits(b)
+    cell = get_computer_move_bits(o_bits, x_bits)
+    return convert_to_text(cell // 3, cell % 3)
+
+def get_computer_move_bits(own, other):
+    """Optimal move for the side holding own - returns a cell index"""
+    # X moves first, so equal counts means own is X
+    if len(MASK_CELLS[own]) == len(MASK_CELLS[other]):
+        index, sym = canonical_index(own, other)
+    else:
+        index, sym = canonical_index(other, own)
+    move = load_solved_table()[index] & NO_MOVE
+    if move == NO_MOVE:
+        # Unreachable or finished position, fall back to the heuristic
+        return get_greedy_move_bits(own, other)
+    return INVERSE_SYMMETRIES[sym][move]
+
+def get_move_values_bits(own, other):
+    """Solved value of each move for the side holding own
+
+    Returns a tuple of 9 entries: VALUE_WIN, VALUE_DRAW or VALUE_LOSS for
+    an empty cell, None for a taken one. Every entry is None once the game
+    is over or for a position that cannot arise in play. Results are cached per canonical
+    position, so the 8 symmetric variants of a board share one entry.
+    """
+    own_is_x = len(MASK_CELLS[own]) == len(MASK_CELLS[other])
+    x_bits, o_bits = (own, other) if own_is_x else (other, own)
+    index, sym = canonical_index(x_bits, o_bits)
+    values = _move_values_cache.get(index)
+    if values is None:
+        CACHE_STATS["misses"] += 1
+        values = _move_values(SYMMETRY_MASKS[sym][x_bits], SYMMETRY_MASKS[sym][o_bits])
+        _move_values_cache[index] = values
+    else:
+        CACHE_STATS["hits"] += 1
+    # Map back from the canonical frame
+    perm = SYMMETRIES[sym]
+    return tuple(values[perm[cell]] for cell in range(9))
+
+def _move_values(x_bits, o_bits):
+    table = load_solved_table()
+    x_to_move = len(MASK_CELLS[x_bits]) == len(MASK_CELLS[o_bits])
+    values = [None] * 9
+    if table[canonical_index(x_bits, o_bits)[0]] & NO_MOVE == NO_MOVE:
+        return values  # Game over, or a position that cannot arise
+    for cell in MASK_CELLS[FULL_BOARD & ~(x_bits | o_bits)]:
+        if x_to_move:
+            index, _ = canonical_index(x_bits | CELL_BITS[cell], o_bits)
+        else:
+            index, _ = canonical_index(x_bits, o_bits | CELL_BITS[cell])
+        # The child's value is for the opponent, who moves next
+        values[cell] = VALUE_WIN - (table[index] >> 4)
+    return values
+
+def tablebase_path(k):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f"ttt4x4_k{k}.tb")
+
+def load_tablebase(k):
+    """Memory-map the finished 4x4 tablebase for k in a row, or None"""
+    if k not in _tablebases:
+        try:
+            with open(tablebase_path(k), "rb") as f:
+                _tablebases[k] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+    return _tablebases[k]
+
+def get_tablebase_move(b, k=4):
+    """Perfect move on a 4x4 board from the tablebase - returns (row, col)
+
+    Returns None if the tablebase for k has not been built or the game is
+    over. Only the pages holding the probed positions are read from disk.
+    """
+    table = load_tablebase(k)
+    if table is None:
+        return None
+    index = 0
+    x_count = 0
+    o_count = 0
+    for cell in range(16):
+        value = b[cell // 4][cell % 4]
+        index += value * 3 ** cell
+        x_count += value == 1
+        o_count += value == 2
+    mark = 1 if x_count == o_count else 2
+    best = None
+    best_rank = -1
+    for cell in range(16):
+        if b[cell // 4][cell % 4] != 0:
+            continue
+        child = index + mark * 3 ** cell
+        value = table[child >> 2] >> ((child & 3) * 2) & 3
+        # The child's value is for the opponent: their loss is our win
+        rank = {TB_LOSS: 2, TB_DRAW: 1, TB_WIN: 0}.get(value, -1)
+        if rank > best_rank:
+            best = (cell // 4, cell % 4)
+            best_rank = rank
+    return best
+
+def get_greedy_move_bits(own, other):
+    """Win, then block, then a random empty cell - returns a cell index"""
     # Try to win
-    win_move = get_winning_move(b, 2)
-    if win_move:
-        return convert_to_text(win_move[0], win_move[1])
+    cell = get_winning_cell(own, other)
+    if cell != -1:
+        return cell
 
     # Try to block
-    block_move = get_winning_move(b, 1)
-    if block_move:
-        return convert_to_text(block_move[0], block_move[1])
+    cell = get_winning_cell(other, own)
+    if cell != -1:
+        return cell
 
     # Random move
-    empty = [(i, j) for i in range(3) for j in range(3) if b[i][j] == 0]
+    empty = MASK_CELLS[FULL_BOARD & ~(own | other)]
     if empty:
-        move = random.choice(empty)
-        return convert_to_text(move[0], move[1])
-    return "mid mid"
+        return random.choice(empty)
+    return 4
 
 def convert_to_text(row, col):
     """Convert coordinates to text move"""
@@ -178,5 +444,991 @@ def convert_to_text(row, col):
     col_text = ["left", "mid", "right"][col]
     return f"{row_text} {col_text}"
 
+def board_to_bits(b):
+    """Convert a list-of-lists board to (x_bits, o_bits)"""
+    x0, o0 = ROW_BITS[tuple(b[0])]
+    x1, o1 = ROW_BITS[tuple(b[1])]
+    x2, o2 = ROW_BITS[tuple(b[2])]
+    return x0 | x1 << 3 | x2 << 6, o0 | o1 << 3 | o2 << 6
+
+def bits_to_board(x_bits, o_bits):
+    """Convert (x_bits, o_bits) back to a list-of-lists board"""
+    return [[1 if x_bits & CELL_BITS[i * 3 + j] else 2 if o_bits & CELL_BITS[i * 3 + j] else 0
+             for j in range(3)] for i in range(3)]
+
+def check_winner_bits(x_bits, o_bits):
+    """Bitboard version of check_winner"""
+    if IS_WIN[x_bits]:
+        return 1
+    if IS_WIN[o_bits]:
+        return 2
+    if x_bits | o_bits == FULL_BOARD:
+        return 3  # Draw
+    return 0  # No winner
+
+def get_winning_cell(own, other):
+    """Cell index that completes a line for own, or -1"""
+    return LOWEST_CELL[THREATS[own] & ~(own | other) & FULL_BOARD]
+
+def board_index(x_bits, o_bits):
+    """Base-3 index of a position (empty 0, X 1, O 2 per cell)"""
+    return TERNARY[x_bits] + 2 * TERNARY[o_bits]
+
+def canonical_index(x_bits, o_bits):
+    """Smallest base-3 index over the 8 symmetries - returns (index, symmetry)"""
+    best_index = TABLE_SIZE
+    best_sym = 0
+    for sym in range(8):
+        masks = SYMMETRY_MASKS[sym]
+        index = TERNARY[masks[x_bits]] + 2 * TERNARY[masks[o_bits]]
+        if index < best_index:
+            best_index = index
+            best_sym = sym
+    return best_index, best_sym
+
+def get_cache_stats():
+    """Hit rate of the symmetry-keyed caches and the size reduction they get
+
+    hits/misses count probes of the solver memo (only when the table is
+    built in this process) and of the get_move_values_bits cache.
+    canonical_positions/raw_positions count the reachable positions with
+    and without folding symmetric boards together.
+    """
+    global _table_coverage
+    if _table_coverage is None:
+        table = load_solved_table()
+        canonical = sum(1 for entry in table if entry != UNREACHABLE)
+        raw = sum(1 for x_bits in range(512) for o_bits in range(512)
+                  if not x_bits & o_bits and table[canonical_index(x_bits, o_bits)[0]] != UNREACHABLE)
+        _table_coverage = (canonical, raw)
+    canonical, raw = _table_coverage
+    lookups = CACHE_STATS["hits"] + CACHE_STATS["misses"]
+    rate = CACHE_STATS["hits"] / lookups if lookups else 0.0
+    return {"hits": CACHE_STATS["hits"], "misses": CACHE_STATS["misses"], "hit_rate": rate,
+            "canonical_positions": canonical, "raw_positions": raw,
+            "reduction": raw / canonical if canonical else 0.0}
+
+def solve_position(x_bits, o_bits, memo):
+    """Memoized negamax score for the side to move (faster wins score higher)
+
+    memo is keyed on the canonical index, and stored moves are in the
+    canonical frame.
+    """
+    index, sym = canonical_index(x_bits, o_bits)
+    if index in memo:
+        CACHE_STATS["hits"] += 1
+        return memo[index][0]
+    CACHE_STATS["misses"] += 1
+    x_bits = SYMMETRY_MASKS[sym][x_bits]
+    o_bits = SYMMETRY_MASKS[sym][o_bits]
+    x_to_move = len(MASK_CELLS[x_bits]) == len(MASK_CELLS[o_bits])
+    own, other = (x_bits, o_bits) if x_to_move else (o_bits, x_bits)
+    empty = MASK_CELLS[FULL_BOARD & ~(x_bits | o_bits)]
+    best_score = 0
+    best_move = NO_MOVE
+    if IS_WIN[other]:
+        best_score = -1 - len(empty)
+    elif empty:
+        best_score = -10
+        for cell in empty:
+            if x_to_move:
+                score = -solve_position(x_bits | CELL_BITS[cell], o_bits, memo)
+            else:
+                score = -solve_position(x_bits, o_bits | CELL_BITS[cell], memo)
+            if score > best_score:
+                best_score = score
+                best_move = cell
+    memo[index] = (best_score, best_move)
+    return best_score
+
+def build_solved_table():
+    """Solve every reachable canonical position and pack it into a byte array"""
+    memo = {}
+    solve_position(0, 0, memo)
+    table = bytearray([UNREACHABLE]) * TABLE_SIZE
+    for index, (score, move) in memo.items():
+        if score > 0:
+            value = VALUE_WIN
+        elif score < 0:
+            value = VALUE_LOSS
+        else:
+            value = VALUE_DRAW
+        table[index] = value << 4 | move
+    return bytes(table)
+
+def load_solved_table():
+    """Load the solved table from disk, building and caching it on first use"""
+    global _solved_table
+    if _solved_table is None:
+        try:
+            with open(SOLVED_TABLE_FILE, "rb") as f:
+                table = f.read()
+        except OSError:
+            table = b""
+        if len(table) != TABLE_SIZE:
+            table = build_solved_table()
+            try:
+                with open(SOLVED_TABLE_FILE, "wb") as f:
+                    f.write(table)
+            except OSError:
+                pass  # Read-only install, keep the table in memory only
+        _solved_table = table
+    return _solved_table
+
+class GameState:
+    """3x3 game tracked incrementally: per-line counts, O(1) make and undo
+
+    Keeps each player's mark count on the 8 lines, the empty-cell count and
+    the set of lines each player threatens, so the winner, winning line and
+    immediate threats never need a rescan.
+    """
+
+    def __init__(self):
+        self.counts = ([0] * 8, [0] * 8)  # Per line, for X and O
+        self.bits = [0, 0]  # X mask, O mask
+        self.threat_lines = [0, 0]  # Lines with two marks and no opposing mark
+        self.empty = 9
+        self.to_move = 1
+        self.winner = 0  # check_winner codes
+        self.winning_line = -1  # Index into WIN_MASKS
+        self.moves = []
+
+    @classmethod
+    def from_board(cls, b):
+        """Replay a list-of-lists board (X moves first)"""
+        game = cls()
+        x_cells = [i * 3 + j for i in range(3) for j in range(3) if b[i][j] == 1]
+        o_cells = [i * 3 + j for i in range(3) for j in range(3) if b[i][j] == 2]
+        for i in range(len(x_cells)):
+            game.make(x_cells[i])
+            if i < len(o_cells):
+                game.make(o_cells[i])
+        return game
+
+    def is_empty(self, cell):
+        return not (self.bits[0] | self.bits[1]) & CELL_BITS[cell]
+
+    def make(self, cell):
+        """Place the side to move's mark on cell"""
+        p = self.to_move - 1
+        own = self.counts[p]
+        for line in CELL_LINES[cell]:
+            own[line] += 1
+            if own[line] == 3 and self.winning_line == -1:
+                self.winner = self.to_move
+                self.winning_line = line
+            self._update_threat(line)
+        self.bits[p] |= CELL_BITS[cell]
+        self.empty -= 1
+        if not self.winner and self.empty == 0:
+            self.winner = 3  # Draw
+        self.moves.append(cell)
+        self.to_move = 3 - self.to_move
+
+    def undo(self):
+        """Take back the last move"""
+        cell = self.moves.pop()
+        self.to_move = 3 - self.to_move
+        p = self.to_move - 1
+        own = self.counts[p]
+        for line in CELL_LINES[cell]:
+            own[line] -= 1
+            self._update_threat(line)
+        self.bits[p] &= ~CELL_BITS[cell]
+        self.empty += 1
+        # Play stops at the first win, so earlier positions had no result
+        self.winner = 0
+        self.winning_line = -1
+
+    def _update_threat(self, line):
+        x_count = self.counts[0][line]
+        o_count = self.counts[1][line]
+        bit = 1 << line
+        if x_count == 2 and o_count == 0:
+            self.threat_lines[0] |= bit
+        else:
+            self.threat_lines[0] &= ~bit
+        if o_count == 2 and x_count == 0:
+            self.threat_lines[1] |= bit
+        else:
+            self.threat_lines[1] &= ~bit
+
+    def threats(self, player):
+        """Mask of empty cells that would complete a line for player"""
+        occupied = self.bits[0] | self.bits[1]
+        return LINE_SET_CELLS[self.threat_lines[player - 1]] & ~occupied
+
+class SearchTimeout(Exception):
+    """Raised inside KInARowEngine when the time budget runs out or it is stopped"""
+
+class KInARowEngine:
+    """Negamax alpha-beta search for k-in-a-row on an n x n board (n <= 7)
+
+    Boards are passed as n x n lists using the same 0/1/2 encoding as b.
+    Positions are hashed with Zobrist keys into a fixed-size transposition
+    table; a slot is replaced when it is empty, left over from an older
+    search, or holds a shallower result.
+    """
+
+    def __init__(self, n=3, k=3, tt_size=1 << 16, seed=0):
+        if not 1 <= k <= n <= MAX_ENGINE_SIZE:
+            raise ValueError(f"Need 1 <= k <= n <= {MAX_ENGINE_SIZE}, got n={n}, k={k}")
+        self.n = n
+        self.k = k
+        self.cells = n * n
+        self.lines = self._build_lines()
+        self._init_search(tt_size, seed)
+
+    def _init_search(self, tt_size, seed):
+        """Build the search tables from self.cells, self.k and self.lines"""
+        self.full = (1 << self.cells) - 1
+        self.cell_lines = [[m for m in self.lines if m >> c & 1] for c in range(self.cells)]
+        # Score for owning i cells of an otherwise empty line
+        self.line_weights = [0] + [10 ** (i - 1) for i in range(1, self.k + 1)]
+
+        rng = random.Random(seed)
+        self.zobrist = [[rng.getrandbits(64) for _ in range(self.cells)] for _ in range(2)]
+        self.zobrist_side = rng.getrandbits(64)
+        self.tt_size = tt_size
+        self.tt = [None] * tt_size
+        self.generation = 0
+        self.history = [0] * self.cells
+        self.nodes = 0
+        self.depth_reached = 0
+        self.deadline = None
+        self.stop = None
+
+        # Static ordering: cells on more lines first, centre breaking ties
+        self.cell_order = sorted(range(self.cells), key=lambda c: (
+            -len(self.cell_lines[c]), self._centre_distance(c)))
+
+    def _centre_distance(self, cell):
+        mid = (self.n - 1) / 2
+        return abs(cell // self.n - mid) + abs(cell % self.n - mid)
+
+    def _coords(self, cell):
+        """Board coordinates of a cell index"""
+        return (cell // self.n, cell % self.n)
+
+    def _build_lines(self):
+        n, k = self.n, self.k
+        lines = []
+        for r in range(n):
+            for c in range(n):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_r, end_c = r + dr * (k - 1), c + dc * (k - 1)
+                    if 0 <= end_r < n and 0 <= end_c < n:
+                        mask = 0
+                        for i in range(k):
+                            mask |= 1 << ((r + dr * i) * n + c + dc * i)
+                        lines.append(mask)
+        return lines
+
+    def board_to_bits(self, board):
+        """Convert an n x n board to (x_bits, o_bits)"""
+        x_bits = 0
+        o_bits = 0
+        for i in range(self.n):
+            for j in range(self.n):
+                if board[i][j] == 1:
+                    x_bits |= 1 << (i * self.n + j)
+                elif board[i][j] == 2:
+                    o_bits |= 1 << (i * self.n + j)
+        return x_bits, o_bits
+
+    def check_winner(self, board):
+        """Same result codes as check_winner for an n x n board"""
+        x_bits, o_bits = self.board_to_bits(board)
+        for m in self.lines:
+            if x_bits & m == m:
+                return 1
+            if o_bits & m == m:
+                return 2
+        if x_bits | o_bits == self.full:
+            return 3  # Draw
+        return 0  # No winner
+
+    def get_winning_move(self, board, player):
+        """Find winning move for player on an n x n board"""
+        x_bits, o_bits = self.board_to_bits(board)
+        own, other = (x_bits, o_bits) if player == 1 else (o_bits, x_bits)
+        cell = self._winning_cell(own, other)
+        if cell == -1:
+            return None
+        return self._coords(cell)
+
+    def best_move(self, board, player, max_depth=None, time_limit=None, stop=None):
+        """Search for player's best move - returns (row, col)"""
+        x_bits, o_bits = self.board_to_bits(board)
+        own, other = (x_bits, o_bits) if player == 1 else (o_bits, x_bits)
+        cell, _ = self.search(own, other, player - 1, max_depth, time_limit, stop)
+        return self._coords(cell)
+
+    def search(self, own, other, side=0, max_depth=None, time_limit=None, stop=None):
+        """Iterative deepening negamax - returns (cell, score) for own to move
+
+        With a time_limit (seconds) the search deepens until the budget runs
+        out and returns the result of the deepest completed iteration. Setting
+        stop (a threading.Event) from another thread ends it the same way.
+        """
+        empty = self.full & ~(own | other)
+        if not empty:
+            return -1, 0
+        if max_depth is None:
+            max_depth = bin(empty).count("1")
+        self.generation += 1
+        self.history = [0] * self.cells
+        self.nodes = 0
+        self.depth_reached = 0
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.stop = stop
+
+        key = side and self.zobrist_side
+        for c in range(self.cells):
+            if own >> c & 1:
+                key ^= self.zobrist[side][c]
+            elif other >> c & 1:
+                key ^= self.zobrist[1 - side][c]
+
+        # A forced win or block needs no search
+        cell = self._winning_cell(own, other)
+        if cell != -1:
+            return cell, WIN_SCORE - 1
+        best_cell = self._winning_cell(other, own)
+        best_score = 0
+        if best_cell == -1:
+            best_cell = next(c for c in self.cell_order if empty >> c & 1)
+
+        for depth in range(1, max_depth + 1):
+            try:
+                score = self._negamax(own, other, key, side, depth, 0, -WIN_SCORE - 1, WIN_SCORE + 1)
+            except SearchTimeout:
+                break  # Keep the last completed iteration's move
+            self.depth_reached = depth
+            best_score = score
+            entry = self.tt[key % self.tt_size]
+            if entry is not None and entry[0] == key and entry[4] != -1:
+                best_cell = entry[4]
+            if abs(score) >= WIN_SCORE - self.cells:
+                break  # Decided, deeper search cannot change the result
+        return best_cell, best_score
+
+    def _out_of_time(self):
+        if self.stop is not None and self.stop.is_set():
+            return True
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def _winning_cell(self, own, other):
+        """Cell completing a line for own, or -1"""
+        for m in self.lines:
+            rest = m & ~own
+            if rest and rest & (rest - 1) == 0 and not rest & other:
+                return rest.bit_length() - 1
+        return -1
+
+    def _evaluate(self, own, other):
+        weights = self.line_weights
+        score = 0
+        for m in self.lines:
+            mine = own & m
+            theirs = other & m
+            if not theirs:
+                score += weights[bin(mine).count("1")]
+            elif not mine:
+                score -= weights[bin(theirs).count("1")]
+        return score
+
+    def _negamax(self, own, other, key, side, depth, ply, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 255 == 0 and self._out_of_time():
+            raise SearchTimeout
+        empty = self.full & ~(own | other)
+        if not empty:
+            return 0  # Draw
+        if depth == 0:
+            return self._evaluate(own, other)
+
+        # Probe the transposition table (mate scores are stored ply-relative)
+        slot = key % self.tt_size
+        entry = self.tt[slot]
+        tt_move = -1
+        if entry is not None and entry[0] == key:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score = entry[3]
+                if score > WIN_SCORE - self.cells:
+                    score -= ply
+                elif score < -WIN_SCORE + self.cells:
+                    score += ply
+                if entry[2] == TT_EXACT:
+                    return score
+                if entry[2] == TT_LOWER and score >= beta:
+                    return score
+                if entry[2] == TT_UPPER and score <= alpha:
+                    return score
+
+        # Move ordering: table move, then history, then static order
+        moves = [c for c in self.cell_order if empty >> c & 1]
+        history = self.history
+        moves.sort(key=lambda c: -history[c])
+        if tt_move != -1 and empty >> tt_move & 1:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        alpha_orig = alpha
+        best_score = -WIN_SCORE - 1
+        best_move = moves[0]
+        zobrist = self.zobrist[side]
+        for cell in moves:
+            placed = own | 1 << cell
+            if any(placed & m == m for m in self.cell_lines[cell]):
+                score = WIN_SCORE - ply - 1
+            else:
+                score = -self._negamax(other, placed, key ^ zobrist[cell] ^ self.zobrist_side,
+                                       1 - side, depth - 1, ply + 1, -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                best_move = cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                history[cell] += depth * depth
+                break
+
+        if best_score <= alpha_orig:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        stored = best_score
+        if stored > WIN_SCORE - self.cells:
+            stored += ply
+        elif stored < -WIN_SCORE + self.cells:
+            stored -= ply
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.tt[slot] = (key, depth, flag, stored, best_move, self.generation)
+        return best_score
+
+class QubicEngine(KInARowEngine):
+    """KInARowEngine on the 4x4x4 cube, with threat-based pruning
+
+    Boards are passed as 4 x 4 x 4 lists indexed [layer][row][col]. Each
+    node first looks for threats (lines needing one more mark): a threat
+    of our own wins at once, two of the opponent's lose, and a single one
+    must be blocked, which is searched without using up depth.
+    """
+
+    def __init__(self, tt_size=1 << 18, seed=0):
+        self.n = 4
+        self.k = 4
+        self.cells = QUBIC_CELLS
+        self.lines = list(QUBIC_LINES)
+        self._init_search(tt_size, seed)
+
+    def _centre_distance(self, cell):
+        layer, row, col = self._coords(cell)
+        return abs(layer - 1.5) + abs(row - 1.5) + abs(col - 1.5)
+
+    def _coords(self, cell):
+        return (cell // 16, cell // 4 % 4, cell % 4)
+
+    def board_to_bits(self, board):
+        """Convert a 4 x 4 x 4 board to (x_bits, o_bits)"""
+        x_bits = 0
+        o_bits = 0
+        for layer in range(4):
+            for row in range(4):
+                for col in range(4):
+                    if board[layer][row][col] == 1:
+                        x_bits |= 1 << (layer * 16 + row * 4 + col)
+                    elif board[layer][row][col] == 2:
+                        o_bits |= 1 << (layer * 16 + row * 4 + col)
+        return x_bits, o_bits
+
+    def _scan(self, own, other):
+        """One pass over the lines - returns (score, own threat cells, other threat cells)"""
+        weights = self.line_weights
+        score = 0
+        own_threats = 0
+        other_threats = 0
+        for m in self.lines:
+            mine = own & m
+            theirs = other & m
+            if not theirs:
+                count = bin(mine).count("1")
+                score += weights[count]
+                if count == 3:
+                    own_threats |= m & ~mine
+            elif not mine:
+                count = bin(theirs).count("1")
+                score -= weights[count]
+                if count == 3:
+                    other_threats |= m & ~theirs
+        return score, own_threats, other_threats
+
+    def _negamax(self, own, other, key, side, depth, ply, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 255 == 0 and self._out_of_time():
+            raise SearchTimeout
+        empty = self.full & ~(own | other)
+        if not empty:
+            return 0  # Draw
+        score, own_threats, other_threats = self._scan(own, other)
+        if own_threats:
+            return WIN_SCORE - ply - 1
+        if other_threats & (other_threats - 1):
+            return -(WIN_SCORE - ply - 2)  # Two threats cannot both be blocked
+        if other_threats:
+            moves = [other_threats.bit_length() - 1]
+        elif depth == 0:
+            return score
+        else:
+            moves = None
+
+        slot = key % self.tt_size
+        entry = self.tt[slot]
+        tt_move = -1
+        if entry is not None and entry[0] == key:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score = entry[3]
+                if score > WIN_SCORE - self.cells:
+                    score -= ply
+                elif score < -WIN_SCORE + self.cells:
+                    score += ply
+                if entry[2] == TT_EXACT:
+                    return score
+                if entry[2] == TT_LOWER and score >= beta:
+                    return score
+                if entry[2] == TT_UPPER and score <= alpha:
+                    return score
+
+        if moves is None:
+            moves = [c for c in self.cell_order if empty >> c & 1]
+            history = self.history
+            moves.sort(key=lambda c: -history[c])
+            if tt_move != -1 and empty >> tt_move & 1:
+                moves.remove(tt_move)
+                moves.insert(0, tt_move)
+            child_depth = depth - 1
+        else:
+            child_depth = depth  # Forced block: extend
+
+        # Our own threats were handled above, so no move here completes a line
+        alpha_orig = alpha
+        best_score = -WIN_SCORE - 1
+        best_move = moves[0]
+        zobrist = self.zobrist[side]
+        for cell in moves:
+            score = -self._negamax(other, own | 1 << cell, key ^ zobrist[cell] ^ self.zobrist_side,
+                                   1 - side, child_depth, ply + 1, -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                best_move = cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.history[cell] += depth * depth
+                break
+
+        if best_score <= alpha_orig:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        stored = best_score
+        if stored > WIN_SCORE - self.cells:
+            stored += ply
+        elif stored < -WIN_SCORE + self.cells:
+            stored -= ply
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.tt[slot] = (key, depth, flag, stored, best_move, self.generation)
+        return best_score
+
+class UltimateState:
+    """Ultimate tic-tac-toe: a 3x3 grid of small boards
+
+    A move is board * 9 + cell. The cell played picks the board the
+    opponent must play in next, unless that board is already decided.
+    """
+
+    def __init__(self):
+        self.x = [0] * 9  # X mask per small board
+        self.o = [0] * 9
+        self.results = [0] * 9  # check_winner code per small board
+        self.macro = [0, 0]  # Small boards won by X and O
+        self.closed = 0  # Small boards that are won or full
+        self.next_board = -1  # -1 means any open board
+        self.to_move = 1
+        self.winner = 0
+
+    def copy(self):
+        state = UltimateState.__new__(UltimateState)
+        state.x = self.x[:]
+        state.o = self.o[:]
+        state.results = self.results[:]
+        state.macro = self.macro[:]
+        state.closed = self.closed
+        state.next_board = self.next_board
+        state.to_move = self.to_move
+        state.winner = self.winner
+        return state
+
+    def legal_moves(self):
+        if self.winner:
+            return []
+        if self.next_board != -1:
+            boards = (self.next_board,)
+        else:
+            boards = MASK_CELLS[FULL_BOARD & ~self.closed]
+        return [board * 9 + cell for board in boards
+                for cell in MASK_CELLS[FULL_BOARD & ~(self.x[board] | self.o[board])]]
+
+    def play(self, move):
+        board, cell = divmod(move, 9)
+        if self.to_move == 1:
+            self.x[board] |= CELL_BITS[cell]
+        else:
+            self.o[board] |= CELL_BITS[cell]
+        result = check_winner_bits(self.x[board], self.o[board])
+        if result:
+            self.results[board] = result
+            self.closed |= CELL_BITS[board]
+            if result != 3:
+                self.macro[result - 1] |= CELL_BITS[board]
+                if IS_WIN[self.macro[result - 1]]:
+                    self.winner = result
+            if not self.winner and self.closed == FULL_BOARD:
+                self.winner = 3  # Draw
+        self.next_board = -1 if self.closed & CELL_BITS[cell] else cell
+        self.to_move = 3 - self.to_move
+
+    def small_board(self, board):
+        """List-of-lists view of one small board"""
+        return bits_to_board(self.x[board], self.o[board])
+
+class MCTSNode:
+    def __init__(self, state, move=-1, parent=None):
+        self.move = move
+        self.parent = parent
+        self.player = 3 - state.to_move  # Who made the move into this node
+        self.children = []
+        self.untried = state.legal_moves()
+        random.shuffle(self.untried)
+        self.wins = 0.0
+        self.visits = 0
+
+    def select_child(self):
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda c: c.wins / c.visits +
+                   UCT_EXPLORATION * math.sqrt(log_visits / c.visits))
+
+def mcts_visits(state, time_budget, seed=None):
+    """Single-process UCT search - returns ({move: visits}, rollouts)"""
+    rng = random.Random(seed)
+    root = MCTSNode(state)
+    deadline = time.perf_counter() + time_budget
+    rollouts = 0
+    while time.perf_counter() < deadline:
+        node = root
+        sim = state.copy()
+        # Selection
+        while not node.untried and node.children:
+            node = node.select_child()
+            sim.play(node.move)
+        # Expansion
+        if node.untried:
+            move = node.untried.pop()
+            sim.play(move)
+            child = MCTSNode(sim, move, node)
+            node.children.append(child)
+            node = child
+        # Rollout
+        while not sim.winner:
+            sim.play(rng.choice(sim.legal_moves()))
+        rollouts += 1
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if sim.winner == node.player:
+                node.wins += 1
+            elif sim.winner == 3:
+                node.wins += 0.5
+            node = node.parent
+    return {child.move: child.visits for child in root.children}, rollouts
+
+def get_ultimate_move(state, time_budget=1.0, workers=None):
+    """MCTS move for the side to move, searching in parallel processes
+
+    Each worker grows its own tree from the current position for the time
+    budget (root parallelization) and the visit counts are summed.
+    Returns (move, rollouts, rollouts_per_second).
+    """
+    global _mcts_pool
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1:
+        results = [mcts_visits(state, time_budget)]
+    else:
+        if _mcts_pool is None:
+            _mcts_pool = ProcessPoolExecutor(max_workers=workers)
+        futures = [_mcts_pool.submit(mcts_visits, state, time_budget, random.getrandbits(32))
+                   for _ in range(workers)]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+
+    visits = {}
+    rollouts = 0
+    for counts, n in results:
+        rollouts += n
+        for move, v in counts.items():
+            visits[move] = visits.get(move, 0) + v
+    if not visits:
+        return random.choice(state.legal_moves()), rollouts, 0.0
+    return max(visits, key=visits.get), rollouts, rollouts / elapsed
+
+def print_ultimate(state):
+    """Draw the 9x9 grid, with each small board's result underneath"""
+    for big_row in range(3):
+        if big_row:
+            print("-------+-------+-------")
+        for row in range(3):
+            parts = []
+            for big_col in range(3):
+                b = state.small_board(big_row * 3 + big_col)
+                parts.append(" ".join(" XO"[v] if v else "." for v in b[row]))
+            print(" " + " | ".join(parts))
+    won = [f"{convert_to_text(i // 3, i % 3)}: {['X', 'O', 'draw'][r - 1]}"
+           for i, r in enumerate(state.results) if r]
+    if won:
+        print("Decided boards: " + ", ".join(won))
+
+def play_ultimate(time_budget=1.0):
+    """Console Ultimate Tic-Tac-Toe, human X against the MCTS computer"""
+    state = UltimateState()
+    moves = []
+    print_ultimate(state)
+    while not state.winner:
+        if state.to_move == 1:
+            board = state.next_board
+            if board == -1:
+                print("You may play on any open board")
+                row, col = convert_move(input("Choose a board: "))
+                if row == -1 or col == -1:
+                    print("Invalid input! Use format like 'top left', 'mid mid', 'bottom right'.")
+                    continue
+                board = row * 3 + col
+                if state.closed & CELL_BITS[board]:
+                    print("Invalid board! That board is already decided.")
+                    continue
+            else:
+                print(f"You must play on the {convert_to_text(board // 3, board % 3)} board")
+            print("To play type (Top|Mid|Bottom) followed by (Left|Mid|Right)")
+            row, col = convert_move(input("Player one make a move: "))
+            if row == -1 or col == -1:
+                print("Invalid input! Use format like 'top left', 'mid mid', 'bottom right'.")
+                continue
+            move = board * 9 + row * 3 + col
+            if move not in state.legal_moves():
+                print("Invalid move! That space is already taken.")
+                continue
+        else:
+            print("Computer's turn")
+            move, rollouts, rate = get_ultimate_move(state, time_budget)
+            board, cell = divmod(move, 9)
+            print(f"Computer plays {convert_to_text(board // 3, board % 3)} board, "
+                  f"{convert_to_text(cell // 3, cell % 3)} "
+                  f"({rollouts} rollouts, {rate:,.0f} rollouts/sec)")
+        state.play(move)
+        moves.append(move)
+        print_ultimate(state)
+
+    if state.winner == 1:
+        print("Player 1 wins!")
+    elif state.winner == 2:
+        print("Computer wins!")
+    else:
+        print("Cat game!")
+    record_game(MODE_ULTIMATE, state.winner, moves)
+
+def check_winner_qubic(x_bits, o_bits):
+    """check_winner result codes for a Qubic position"""
+    for m in QUBIC_LINES:
+        if x_bits & m == m:
+            return 1
+        if o_bits & m == m:
+            return 2
+    if x_bits | o_bits == (1 << QUBIC_CELLS) - 1:
+        return 3  # Draw
+    return 0  # No winner
+
+def convert_qubic_move(move):
+    """Convert "layer row col" (each 1-4) to a cell index, or -1"""
+    digits = [ch for ch in move if not ch.isspace() and ch not in ",;"]
+    if len(digits) != 3 or not all(ch in "1234" for ch in digits):
+        return -1
+    layer, row, col = (int(ch) - 1 for ch in digits)
+    return layer * 16 + row * 4 + col
+
+def print_qubic(x_bits, o_bits):
+    """Draw the four layers side by side, bottom layer first"""
+    print("   " + "   ".join(f"layer {layer + 1}" for layer in range(4)))
+    for row in range(4):
+        parts = []
+        for layer in range(4):
+            cells = []
+            for col in range(4):
+                bit = 1 << (layer * 16 + row * 4 + col)
+                cells.append("X" if x_bits & bit else "O" if o_bits & bit else ".")
+            parts.append(" ".join(cells))
+        print(f"{row + 1}  " + "   ".join(parts))
+
+def play_qubic(time_limit=QUBIC_TIME_LIMIT):
+    """Console Qubic (4x4x4), human X against QubicEngine"""
+    engine = QubicEngine()
+    bits = [0, 0]
+    moves = []
+    side = 0
+    print_qubic(*bits)
+    winner = 0
+    while not winner:
+        if side == 0:
+            print("To play type layer, row and column, each 1-4 (e.g. '2 3 1')")
+            cell = convert_qubic_move(input("Player one make a move: "))
+            if cell == -1:
+                print("Invalid input! Use format like '1 1 1', '2 3 4'.")
+                continue
+            if (bits[0] | bits[1]) >> cell & 1:
+                print("Invalid move! That space is already taken.")
+                continue
+        else:
+            print("Computer's turn")
+            start = time.perf_counter()
+            cell, _ = engine.search(bits[1], bits[0], 1, time_limit=time_limit)
+            layer, row, col = engine._coords(cell)
+            print(f"Computer plays {layer + 1} {row + 1} {col + 1} "
+                  f"(depth {engine.depth_reached}, {engine.nodes} nodes in "
+                  f"{time.perf_counter() - start:.2f}s)")
+        bits[side] |= 1 << cell
+        moves.append(cell)
+        side = 1 - side
+        print_qubic(*bits)
+        winner = check_winner_qubic(*bits)
+
+    if winner == 1:
+        print("Player 1 wins!")
+    elif winner == 2:
+        print("Computer wins!")
+    else:
+        print("Cat game!")
+    record_game(MODE_QUBIC, winner, moves)
+
+def read_positions(lines):
+    """Parse each input line into (x_bits, o_bits), or an error string
+
+    A line is either a 0/1/2 grid (9 digits, any separators) or text moves
+    separated by commas or semicolons, played alternately from X.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        digits = [ch for ch in line if ch.isdigit()]
+        if len(digits) == 9 and all(ch in "012" for ch in digits):
+            x_bits = sum(CELL_BITS[i] for i in range(9) if digits[i] == "1")
+            o_bits = sum(CELL_BITS[i] for i in range(9) if digits[i] == "2")
+            yield x_bits, o_bits
+            continue
+        yield _replay_moves(line.replace(";", ",").split(","))
+
+def _replay_moves(moves):
+    game = GameState()
+    for text in moves:
+        row, col = convert_move(text)
+        if row == -1 or col == -1:
+            return f"bad move '{text.strip()}'"
+        if game.winner:
+            return f"move '{text.strip()}' after the game ended"
+        if not game.is_empty(row * 3 + col):
+            return f"move '{text.strip()}' on a taken space"
+        game.make(row * 3 + col)
+    return game.bits[0], game.bits[1]
+
+def analyze_positions(positions):
+    """Yield (board, status, best move, winning line) for each position
+
+    Invalid input gets status "invalid" with the reason in the last field.
+    """
+    for position in positions:
+        if isinstance(position, str):
+            yield "-", "invalid", "-", position
+            continue
+        x_bits, o_bits = position
+        board = "".join("1" if x_bits & CELL_BITS[i] else "2" if o_bits & CELL_BITS[i] else "0"
+                        for i in range(9))
+        x_count = len(MASK_CELLS[x_bits])
+        o_count = len(MASK_CELLS[o_bits])
+        if x_count - o_count not in (0, 1) or (IS_WIN[x_bits] and IS_WIN[o_bits]):
+            yield board, "invalid", "-", "impossible position"
+            continue
+        winner = check_winner_bits(x_bits, o_bits)
+        if winner == 3:
+            yield board, "draw", "-", "-"
+        elif winner:
+            winner_bits = x_bits if winner == 1 else o_bits
+            line = next(l for l in range(8) if winner_bits & WIN_MASKS[l] == WIN_MASKS[l])
+            yield board, "x_wins" if winner == 1 else "o_wins", "-", LINE_NAMES[line]
+        elif x_count == o_count:
+            cell = get_computer_move_bits(x_bits, o_bits)
+            yield board, "x_to_move", convert_to_text(cell // 3, cell % 3), "-"
+        else:
+            cell = get_computer_move_bits(o_bits, x_bits)
+            yield board, "o_to_move", convert_to_text(cell // 3, cell % 3), "-"
+
+def write_results(results, out, batch_lines=4096):
+    """Write tab-separated results, batching lines into large writes"""
+    batch = []
+    for result in results:
+        batch.append("\t".join(result))
+        if len(batch) >= batch_lines:
+            batch.append("")
+            out.write("\n".join(batch))
+            batch.clear()
+    if batch:
+        batch.append("")
+        out.write("\n".join(batch))
+    out.flush()
+
+def analyze_main(argv):
+    """Non-interactive entry point: python prog1n2.py --analyze [file]"""
+    parser = argparse.ArgumentParser(prog="prog1n2.py --analyze",
+                                     description="Analyze positions, one per line, streaming")
+    parser.add_argument("file", nargs="?", help="input file (default: stdin)")
+    args = parser.parse_args(argv)
+    if args.file:
+        try:
+            source = open(args.file, buffering=1 << 20)
+        except OSError as e:
+            parser.error(f"can't open '{args.file}': {e.strerror}")
+    else:
+        source = sys.stdin
+    try:
+        write_results(analyze_positions(read_positions(source)), sys.stdout)
+    except BrokenPipeError:
+        # Output closed early (e.g. piped into head)
+        sys.stderr.close()
+    finally:
+        if args.file:
+            source.close()
+
+# Opt-in AI timing, enabled by setting TTT_PROFILE
+instrument_functions(globals(), ["check_winner", "get_winning_move",
+                                 "get_computer_move", "get_computer_move_bits"])
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if sys.argv[1:2] == ["--analyze"]:
+        analyze_main(sys.argv[2:])
+    else:
+        main()
\ No newline at end of file
@@ -1,6 +1,14 @@
 import random
 import pygame as pygame
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from prog1n2 import (VALUE_DRAW, VALUE_LOSS, VALUE_WIN, GameState, KInARowEngine, board_to_bits,
+                     convert_to_text, get_computer_move_bits, get_move_values_bits)
+from ttt_index import OpeningIndex
+from ttt_instrument import instrument_functions
+from ttt_records import record_game
 
 # Initialize Pygame
 pygame.init()
@@ -24,30 +32,144 @@ BUTTON_COLOR = (60, 60, 100)
 BUTTON_HOVER_COLOR = (80, 80, 140)
 WIN_LINE_COLOR = (255, 215, 0)
 
+# Evaluation overlay (toggled with H): each empty cell tinted by the solved
+# result of playing there for the side to move
+HEAT_COLORS = {
+    VALUE_WIN: (80, 220, 120, 70),
+    VALUE_DRAW: (230, 200, 80, 50),
+    VALUE_LOSS: (230, 70, 70, 70),
+}
+
+# Computer difficulty: (name, max search depth, think time budget in ms).
+# Perfect reads the solved table instead of searching.
+DIFFICULTIES = (
+    ("Easy", 1, 10),
+    ("Medium", 2, 50),
+    ("Hard", None, 300),
+    ("Perfect", None, 0),
+)
+DEFAULT_DIFFICULTY = 2
+COMPUTER_MOVE_DELAY = 500  # ms from the human move to the computer's reply
+THINKING_DOT_MS = 300  # Animation step of "Computer is thinking..."
+FPS = 60
+
+# Block on input while nothing on screen can change, instead of redrawing
+# at 60 FPS. A frame is drawn only after an event, a hover change or a move.
+EVENT_DRIVEN = True
+
+# Rendered text surfaces kept by TextCache
+TEXT_CACHE_SIZE = 256
+
+# Screen regions redrawn on their own after a move
+BOARD_RECT = pygame.Rect(BOARD_OFFSET, BOARD_OFFSET + 60, BOARD_SIZE, BOARD_SIZE)
+HEADER_RECT = pygame.Rect(0, 0, WINDOW_WIDTH, BOARD_OFFSET + 60)
+FOOTER_RECT = pygame.Rect(0, BOARD_OFFSET + 60 + BOARD_SIZE, WINDOW_WIDTH,
+                          WINDOW_HEIGHT - BOARD_OFFSET - 60 - BOARD_SIZE)
+
 # Game states
 STATE_MENU = 0
 STATE_PLAYING = 1
 STATE_GAME_OVER = 2
 
+# get_winning_line result for each GameState.winning_line index
+WINNING_LINES = (("row", 0), ("row", 1), ("row", 2),
+                 ("col", 0), ("col", 1), ("col", 2),
+                 ("diag1", 0), ("diag2", 0))
+
+class TextCache:
+    """LRU cache of rendered text keyed on (text, font, color, antialias)"""
+
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        key = (text, font, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+class CachedFont:
+    """A pygame Font whose render() goes through a TextCache
+
+    The returned surfaces are shared, so callers must only blit them.
+    """
+
+    def __init__(self, font, cache):
+        self.font = font
+        self.cache = cache
+
+    def render(self, text, antialias, color):
+        return self.cache.render(self.font, text, antialias, color)
+
 class TicTacToeGame:
     def __init__(self):
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("Tic Tac Toe")
         self.clock = pygame.time.Clock()
-        self.font_large = pygame.font.Font(None, 80)
-        self.font_medium = pygame.font.Font(None, 50)
-        self.font_small = pygame.font.Font(None, 35)
+        self.text_cache = TextCache()
+        self.font_large = CachedFont(pygame.font.Font(None, 80), self.text_cache)
+        self.font_medium = CachedFont(pygame.font.Font(None, 50), self.text_cache)
+        self.font_small = CachedFont(pygame.font.Font(None, 35), self.text_cache)
+        # The computer searches on a worker thread so the window stays live
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="computer")
+        self.computer_future = None
+        self.computer_stop = None
+        self.board_layer = self.build_board_layer()
+        self.mark_sprites = {1: self.build_x_sprite(), 2: self.build_o_sprite()}
+        try:
+            self.openings = OpeningIndex()
+        except (OSError, ValueError):
+            self.openings = None  # No index built yet (see ttt_index.py)
         self.reset_game()
         self.state = STATE_MENU
         self.mode = None
+        self.difficulty = DEFAULT_DIFFICULTY
+        self.buttons = []  # Button rects drawn in the last frame
+        self.hovered = None  # Rect in self.buttons under the mouse
+        self.dirty = True  # Whole window needs redrawing
+        self.dirty_rects = []  # Or just these regions
+        self.show_heatmap = False
+        self.heat_layer = None
+        self.heat_position = None  # Bits the heat layer was built for
 
     def reset_game(self):
+        self.cancel_computer_move()
         self.board = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+        self.position = GameState()
         self.current_player = 1
         self.winner = None
         self.winning_line = None
         self.computer_thinking = False
         self.computer_move_time = 0
+        self.thinking_dots = 3
+        self.update_opening_stats()
+        self.dirty = True
+        self.dirty_rects = []
+
+    def update_opening_stats(self):
+        """Look up the current position in the opening index"""
+        self.opening_text = None
+        if self.openings is None:
+            return
+        x_wins, o_wins, draws, next_moves = self.openings.lookup(*self.position.bits)
+        total = x_wins + o_wins + draws
+        if total:
+            best = max(range(9), key=lambda c: next_moves[c])
+            self.opening_text = (f"{total} games: X {x_wins / total:.0%}, draw {draws / total:.0%}, "
+                                 f"O {o_wins / total:.0%}")
+            if next_moves[best]:
+                self.opening_text += f" - usual reply {convert_to_text(best // 3, best % 3)}"
 
     def draw_menu(self):
         self.screen.fill(BG_COLOR)
@@ -77,27 +199,88 @@ class TicTacToeGame:
         hvc_text_rect = hvc_text.get_rect(center=hvc_rect.center)
         self.screen.blit(hvc_text, hvc_text_rect)
 
-        return hvh_rect, hvc_rect
+        # Difficulty button, cycles through DIFFICULTIES
+        diff_rect = pygame.Rect(250, 590, 300, 60)
+        diff_color = BUTTON_HOVER_COLOR if diff_rect.collidepoint(mouse_pos) else BUTTON_COLOR
+        pygame.draw.rect(self.screen, diff_color, diff_rect, border_radius=15)
+        pygame.draw.rect(self.screen, LINE_COLOR, diff_rect, 3, border_radius=15)
+        diff_text = self.font_small.render(f"Difficulty: {DIFFICULTIES[self.difficulty][0]}", True, TEXT_COLOR)
+        diff_text_rect = diff_text.get_rect(center=diff_rect.center)
+        self.screen.blit(diff_text, diff_text_rect)
 
-    def draw_board(self):
-        self.screen.fill(BG_COLOR)
+        self.set_buttons([hvh_rect, hvc_rect, diff_rect])
+        return hvh_rect, hvc_rect, diff_rect
+
+    def build_board_layer(self):
+        """Pre-render the static background, board and grid lines"""
+        layer = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        layer.fill(BG_COLOR)
 
         # Draw board background
-        board_rect = pygame.Rect(BOARD_OFFSET, BOARD_OFFSET + 60, BOARD_SIZE, BOARD_SIZE)
-        pygame.draw.rect(self.screen, BOARD_COLOR, board_rect, border_radius=10)
+        pygame.draw.rect(layer, BOARD_COLOR, BOARD_RECT, border_radius=10)
 
         # Draw grid lines
         for i in range(1, 3):
             # Vertical lines
             x = BOARD_OFFSET + i * CELL_SIZE
-            pygame.draw.line(self.screen, LINE_COLOR,
+            pygame.draw.line(layer, LINE_COLOR,
                             (x, BOARD_OFFSET + 60),
                             (x, BOARD_OFFSET + 60 + BOARD_SIZE), LINE_WIDTH)
             # Horizontal lines
             y = BOARD_OFFSET + 60 + i * CELL_SIZE
-            pygame.draw.line(self.screen, LINE_COLOR,
+            pygame.draw.line(layer, LINE_COLOR,
                             (BOARD_OFFSET, y),
                             (BOARD_OFFSET + BOARD_SIZE, y), LINE_WIDTH)
+        return layer.convert()
+
+    def build_x_sprite(self):
+        sprite = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+        center = CELL_SIZE // 2
+        offset = CELL_SIZE // 3
+        pygame.draw.line(sprite, X_COLOR,
+                        (center - offset, center - offset),
+                        (center + offset, center + offset), 12)
+        pygame.draw.line(sprite, X_COLOR,
+                        (center + offset, center - offset),
+                        (center - offset, center + offset), 12)
+        return sprite.convert_alpha()
+
+    def build_o_sprite(self):
+        sprite = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+        center = CELL_SIZE // 2
+        pygame.draw.circle(sprite, O_COLOR, (center, center), CELL_SIZE // 3, 12)
+        return sprite.convert_alpha()
+
+    def cell_rect(self, row, col):
+        return pygame.Rect(BOARD_OFFSET + col * CELL_SIZE, BOARD_OFFSET + 60 + row * CELL_SIZE,
+                           CELL_SIZE, CELL_SIZE)
+
+    def build_heat_layer(self):
+        """Board layer with each empty cell tinted by its solved value for the side to move"""
+        tint = pygame.Surface((BOARD_SIZE, BOARD_SIZE), pygame.SRCALPHA)
+        own = self.position.bits[self.position.to_move - 1]
+        other = self.position.bits[2 - self.position.to_move]
+        for cell, value in enumerate(get_move_values_bits(own, other)):
+            if value is not None:
+                rect = self.cell_rect(cell // 3, cell % 3).move(-BOARD_OFFSET, -BOARD_OFFSET - 60)
+                # Stay clear of the grid lines
+                tint.fill(HEAT_COLORS[value], rect.inflate(-LINE_WIDTH, -LINE_WIDTH))
+        # Composite once, so a frame costs one opaque blit as without the overlay
+        layer = self.board_layer.copy()
+        layer.blit(tint, BOARD_RECT)
+        return layer
+
+    def background_layer(self):
+        if not self.show_heatmap or self.state != STATE_PLAYING:
+            return self.board_layer
+        # Rebuilt only when the position changes
+        if self.heat_position != self.position.bits:
+            self.heat_layer = self.build_heat_layer()
+            self.heat_position = self.position.bits[:]
+        return self.heat_layer
+
+    def draw_board(self):
+        self.screen.blit(self.background_layer(), (0, 0))
 
         # Draw X's and O's
         for row in range(3):
@@ -114,7 +297,7 @@ class TicTacToeGame:
         # Draw header
         if self.state == STATE_PLAYING:
             if self.computer_thinking:
-                text = "Computer is thinking..."
+                text = "Computer is thinking" + "." * self.thinking_dots
             else:
                 player_name = "X" if self.current_player == 1 else "O"
                 text = f"Player {player_name}'s Turn"
@@ -131,6 +314,11 @@ class TicTacToeGame:
         header_rect = header.get_rect(center=(WINDOW_WIDTH // 2, 30))
         self.screen.blit(header, header_rect)
 
+        # Opening statistics for the current position
+        if self.state == STATE_PLAYING and self.opening_text:
+            stats = self.font_small.render(self.opening_text, True, TEXT_COLOR)
+            self.screen.blit(stats, stats.get_rect(center=(WINDOW_WIDTH // 2, 850)))
+
         # Draw restart button if game over
         if self.state == STATE_GAME_OVER:
             mouse_pos = pygame.mouse.get_pos()
@@ -141,25 +329,16 @@ class TicTacToeGame:
             restart_text = self.font_small.render("Play Again", True, TEXT_COLOR)
             restart_text_rect = restart_text.get_rect(center=restart_rect.center)
             self.screen.blit(restart_text, restart_text_rect)
+            self.set_buttons([restart_rect])
             return restart_rect
+        self.set_buttons([])
         return None
 
     def draw_x(self, row, col):
-        x_center = BOARD_OFFSET + col * CELL_SIZE + CELL_SIZE // 2
-        y_center = BOARD_OFFSET + 60 + row * CELL_SIZE + CELL_SIZE // 2
-        offset = CELL_SIZE // 3
-        pygame.draw.line(self.screen, X_COLOR,
-                        (x_center - offset, y_center - offset),
-                        (x_center + offset, y_center + offset), 12)
-        pygame.draw.line(self.screen, X_COLOR,
-                        (x_center + offset, y_center - offset),
-                        (x_center - offset, y_center + offset), 12)
+        self.screen.blit(self.mark_sprites[1], self.cell_rect(row, col))
 
     def draw_o(self, row, col):
-        x_center = BOARD_OFFSET + col * CELL_SIZE + CELL_SIZE // 2
-        y_center = BOARD_OFFSET + 60 + row * CELL_SIZE + CELL_SIZE // 2
-        radius = CELL_SIZE // 3
-        pygame.draw.circle(self.screen, O_COLOR, (x_center, y_center), radius, 12)
+        self.screen.blit(self.mark_sprites[2], self.cell_rect(row, col))
 
     def draw_winning_line(self):
         if not self.winning_line:
@@ -203,36 +382,116 @@ class TicTacToeGame:
 
     def make_move(self, row, col):
         if self.board[row][col] == 0:
+            # The cell, turn header and opening statistics change
+            self.dirty_rects += [self.cell_rect(row, col), HEADER_RECT, FOOTER_RECT]
+            if self.show_heatmap:
+                self.dirty_rects.append(BOARD_RECT)  # Every cell's shade may change
             self.board[row][col] = self.current_player
-            winner_result = check_winner(self.board)
+            self.position.make(row * 3 + col)
+            self.update_opening_stats()
+            winner_result = self.position.winner
             if winner_result:
                 self.winner = winner_result
-                self.winning_line = get_winning_line(self.board)
+                if self.position.winning_line != -1:
+                    self.winning_line = WINNING_LINES[self.position.winning_line]
                 self.state = STATE_GAME_OVER
+                self.dirty = True  # Winning line and restart button
+                record_game(self.mode, winner_result, self.position.moves)
             else:
                 self.current_player = 2 if self.current_player == 1 else 1
                 # If computer's turn, schedule computer move
                 if self.mode == 2 and self.current_player == 2 and self.state == STATE_PLAYING:
                     self.computer_thinking = True
                     self.computer_move_time = pygame.time.get_ticks()
+                    self.thinking_dots = 1
+                    self.start_computer_move()
+
+    def start_computer_move(self):
+        """Search for the computer's reply on the worker thread"""
+        self.computer_stop = threading.Event()
+        board = [row[:] for row in self.board]
+        self.computer_future = self.executor.submit(get_computer_move, board, self.difficulty,
+                                                    self.computer_stop)
+
+    def cancel_computer_move(self):
+        """Abandon a search in progress, e.g. when leaving the game"""
+        if self.computer_future is not None:
+            self.computer_stop.set()
+            self.computer_future.cancel()
+            self.computer_future = None
 
     def update(self):
         if self.computer_thinking:
-            # Add a small delay for better UX
-            if pygame.time.get_ticks() - self.computer_move_time > 500:
-                row, col = get_computer_move(self.board)
+            ticks = pygame.time.get_ticks()
+            dots = 1 + (ticks - self.computer_move_time) // THINKING_DOT_MS % 3
+            if dots != self.thinking_dots:
+                self.thinking_dots = dots
+                self.dirty_rects.append(HEADER_RECT)
+            # Add a small delay for better UX: the reply lands no sooner than
+            # COMPUTER_MOVE_DELAY ms after the human move
+            if self.computer_future.done() and ticks - self.computer_move_time > COMPUTER_MOVE_DELAY:
+                row, col = self.computer_future.result()
+                self.computer_future = None
                 self.make_move(row, col)
                 self.computer_thinking = False
 
+    def draw(self):
+        if self.state == STATE_MENU:
+            self.draw_menu()
+        else:
+            self.draw_board()
+
+    def set_buttons(self, rects):
+        """Install the buttons just drawn, drawn hovered if under the mouse"""
+        self.buttons = rects
+        pos = pygame.mouse.get_pos()
+        self.hovered = next((rect for rect in rects if rect.collidepoint(pos)), None)
+
+    def update_hover(self, pos):
+        """Mark the frame dirty if the mouse moved onto or off a button"""
+        hovered = next((rect for rect in self.buttons if rect.collidepoint(pos)), None)
+        if hovered != self.hovered:
+            for rect in (self.hovered, hovered):
+                if rect is not None:
+                    self.dirty_rects.append(rect)
+            self.hovered = hovered
+
+    def wait_events(self):
+        """Pending events, blocking until there is one if nothing needs drawing"""
+        if not EVENT_DRIVEN or self.dirty or self.dirty_rects:
+            return pygame.event.get()
+        if self.computer_thinking:
+            # Keep animating and polling the worker at the frame rate
+            event = pygame.event.wait(1000 // FPS)
+        else:
+            event = pygame.event.wait()
+        events = pygame.event.get()
+        if event.type != pygame.NOEVENT:
+            events.insert(0, event)
+        return events
+
     def run(self):
         running = True
         while running:
-            for event in pygame.event.get():
+            for event in self.wait_events():
                 if event.type == pygame.QUIT:
                     running = False
+                if event.type == pygame.MOUSEMOTION:
+                    self.update_hover(event.pos)
+                    continue
+                # Clicks mark what they change; anything else (keys, window
+                # exposure) redraws the whole frame
+                if event.type not in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+                    self.dirty = True
+                # Escape leaves a game, cancelling any computer move in progress
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE and self.state != STATE_MENU:
+                    self.state = STATE_MENU
+                    self.reset_game()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                    self.show_heatmap = not self.show_heatmap
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if self.state == STATE_MENU:
-                        hvh_rect, hvc_rect = self.draw_menu()
+                        hvh_rect, hvc_rect, diff_rect = self.draw_menu()
                         if hvh_rect.collidepoint(event.pos):
                             self.mode = 1
                             self.state = STATE_PLAYING
@@ -241,6 +500,9 @@ class TicTacToeGame:
                             self.mode = 2
                             self.state = STATE_PLAYING
                             self.reset_game()
+                        elif diff_rect.collidepoint(event.pos):
+                            self.difficulty = (self.difficulty + 1) % len(DIFFICULTIES)
+                            self.dirty_rects.append(diff_rect)
                     elif self.state == STATE_PLAYING:
                         self.handle_click(event.pos)
                     elif self.state == STATE_GAME_OVER:
@@ -251,14 +513,22 @@ class TicTacToeGame:
 
             self.update()
 
-            if self.state == STATE_MENU:
-                self.draw_menu()
-            else:
-                self.draw_board()
-
-            pygame.display.flip()
-            self.clock.tick(60)
-
+            if self.dirty or not EVENT_DRIVEN:
+                self.draw()
+                pygame.display.flip()
+            elif self.dirty_rects:
+                # Redraw only the changed regions and push just those
+                for rect in self.dirty_rects:
+                    self.screen.set_clip(rect)
+                    self.draw()
+                self.screen.set_clip(None)
+                pygame.display.update(self.dirty_rects)
+            self.dirty = False
+            self.dirty_rects = []
+            self.clock.tick(FPS)
+
+        self.cancel_computer_move()
+        self.executor.shutdown()
         pygame.quit()
         sys.exit()
 
@@ -322,7 +592,29 @@ def get_winning_move(b, player):
         return (idx, 2 - idx)
     return None
 
-def get_computer_move(b):
+def get_computer_move(b, difficulty=len(DIFFICULTIES) - 1, stop=None):
+    """Get computer move for a DIFFICULTIES level - returns (row, col) tuple
+
+    Setting stop (a threading.Event) cuts a search short.
+    """
+    name, max_depth, budget = DIFFICULTIES[difficulty]
+    if name != "Perfect":
+        return get_search_move(b, max_depth, budget / 1000, stop)
+    # Optimal move from the solved table
+    x_bits, o_bits = board_to_bits(b)
+    cell = get_computer_move_bits(o_bits, x_bits)
+    return (cell // 3, cell % 3)
+
+_search_engines = {}
+
+def get_search_move(b, max_depth, time_limit, stop=None):
+    """Iteratively deepened search for player 2, stopped after time_limit seconds"""
+    n = len(b)
+    if n not in _search_engines:
+        _search_engines[n] = KInARowEngine(n, n)
+    return _search_engines[n].best_move(b, 2, max_depth, time_limit, stop)
+
+def get_center_corner_move(b):
     """Get computer move with strategy - returns (row, col) tuple"""
     # Try to win
     win_move = get_winning_move(b, 2)
@@ -350,6 +642,9 @@ def get_computer_move(b):
         return random.choice(empty)
     return (1, 1)  # Fallback (shouldn't reach here)
 
+# Opt-in AI timing, enabled by setting TTT_PROFILE
+instrument_functions(globals(), ["check_winner", "get_winning_move", "get_computer_move"])
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,162 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import time
+
+import prog1n2
+
+# pygame prints a banner to stdout on import, which would corrupt the JSON
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+try:
+    import prog3
+except ImportError:  # prog3 needs pygame
+    prog3 = None
+
+# Text moves accepted (and rejected) by convert_move
+MOVE_TEXTS = [
+    "top left", "top mid", "top right", "mid left", "mid mid", "mid right",
+    "bottom left", "bottom mid", "bottom right", "Upper L", "center centre",
+    "bot r", "  lower   middle ", "down right", "left top", "middle", "nonsense",
+    "top", "",
+]
+
+
+def build_positions():
+    """Every legal position: consistent move counts and at most one winner"""
+    boards = []
+    for cells in itertools.product((0, 1, 2), repeat=9):
+        x_count = cells.count(1)
+        o_count = cells.count(2)
+        if x_count - o_count not in (0, 1):
+            continue
+        b = [list(cells[0:3]), list(cells[3:6]), list(cells[6:9])]
+        x_bits, o_bits = prog1n2.board_to_bits(b)
+        if prog1n2.IS_WIN[x_bits] and prog1n2.IS_WIN[o_bits]:
+            continue
+        boards.append(b)
+    return boards
+
+
+def build_cases(boards):
+    """(name, function, argument tuples) for each benchmarked call"""
+    ongoing = [b for b in boards if prog1n2.check_winner(b) == 0]
+    coords = [(i, j) for i in range(3) for j in range(3)]
+    to_move = []  # (own, other) bitboards for the side to move
+    for b in ongoing:
+        x_bits, o_bits = prog1n2.board_to_bits(b)
+        x_to_move = len(prog1n2.MASK_CELLS[x_bits]) == len(prog1n2.MASK_CELLS[o_bits])
+        to_move.append((x_bits, o_bits) if x_to_move else (o_bits, x_bits))
+    cases = [
+        ("prog1n2.check_winner", prog1n2.check_winner, [(b,) for b in boards]),
+        ("prog1n2.get_winning_move", prog1n2.get_winning_move,
+         [(b, p) for b in boards for p in (1, 2)]),
+        ("prog1n2.get_computer_move", prog1n2.get_computer_move, [(b,) for b in ongoing]),
+        ("prog1n2.get_move_values_bits", prog1n2.get_move_values_bits, to_move),
+        ("prog1n2.convert_move", prog1n2.convert_move, [(m,) for m in MOVE_TEXTS]),
+        ("prog1n2.convert_to_text", prog1n2.convert_to_text, coords),
+    ]
+    if prog3 is not None:
+        cases += [
+            ("prog3.check_winner", prog3.check_winner, [(b,) for b in boards]),
+            ("prog3.get_winning_line", prog3.get_winning_line, [(b,) for b in boards]),
+            ("prog3.get_winning_move", prog3.get_winning_move,
+             [(b, p) for b in boards for p in (1, 2)]),
+            ("prog3.get_computer_move", prog3.get_computer_move, [(b,) for b in ongoing]),
+        ]
+    return cases
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def run_case(func, args_list, min_time):
+    """Time func over the corpus until min_time seconds have been spent"""
+    perf_counter_ns = time.perf_counter_ns
+    # Throughput: tight loop over the corpus, no per-call timing
+    calls = 0
+    start = perf_counter_ns()
+    elapsed = 0
+    while elapsed < min_time * 1e9:
+        for args in args_list:
+            func(*args)
+        calls += len(args_list)
+        elapsed = perf_counter_ns() - start
+
+    # Latency: one pass with each call timed individually
+    latencies = []
+    for args in args_list:
+        t0 = perf_counter_ns()
+        func(*args)
+        latencies.append(perf_counter_ns() - t0)
+    latencies.sort()
+    return {
+        "calls": calls,
+        "corpus_size": len(args_list),
+        "ops_per_sec": calls / (elapsed / 1e9),
+        "p50_ns": percentile(latencies, 50),
+        "p90_ns": percentile(latencies, 90),
+        "p99_ns": percentile(latencies, 99),
+        "max_ns": latencies[-1],
+    }
+
+
+def run_benchmarks(min_time=0.5, only=None):
+    random.seed(0)
+    prog1n2.load_solved_table()  # Keep one-time table loading out of the timings
+    cases = build_cases(build_positions())
+    results = {}
+    for name, func, args_list in cases:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = run_case(func, args_list, min_time)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "min_time": min_time,
+            "prog3": prog3 is not None,
+        },
+        "results": results,
+        # Symmetry-keyed cache hit rate and position counts (see prog1n2)
+        "cache_stats": prog1n2.get_cache_stats(),
+    }
+
+
+def compare(report, baseline):
+    """Add ops/sec ratios against a previous report"""
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base:
+            result["speedup"] = result["ops_per_sec"] / base["ops_per_sec"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tic-tac-toe engine functions")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="seconds to spend timing each function")
+    parser.add_argument("--only", nargs="*", help="run only benchmarks whose name contains one of these")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.min_time, args.only)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+
+import prog1n2
+from ttt_records import FIRST_FRAME, FRAME_HEADER, MODE_COMPUTER, MODE_HUMAN, GameRecordReader
+
+# Opening statistics keyed by canonical position (prog1n2.canonical_index).
+# After MAGIC the file holds prog1n2.TABLE_SIZE fixed-size entries of
+# little-endian u32 counts: X wins, O wins, draws, then how often each of
+# the 9 cells (in the canonical frame) was played next. The sources file
+# alongside records how far each record file has been read, so a rebuild
+# only reads games appended since.
+MAGIC = b"TTTI\x01\x00\x00\x00"
+ENTRY = struct.Struct("<12I")
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ttt_openings.idx")
+INDEXED_MODES = (MODE_HUMAN, MODE_COMPUTER)
+
+
+def sources_path(index_path):
+    return index_path + ".sources.json"
+
+
+def load_counts(index_path):
+    counts = array("I")
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{index_path} is not an opening index")
+            counts.fromfile(f, prog1n2.TABLE_SIZE * 12)
+    else:
+        counts.frombytes(bytes(prog1n2.TABLE_SIZE * ENTRY.size))
+    return counts
+
+
+def add_game(counts, result, moves):
+    """Count one finished game at every position it passed through"""
+    x_bits = 0
+    o_bits = 0
+    column = result - 1  # X wins, O wins, draws
+    for ply, move in enumerate(moves):
+        index, sym = prog1n2.canonical_index(x_bits, o_bits)
+        base = index * 12
+        counts[base + column] += 1
+        counts[base + 3 + prog1n2.SYMMETRIES[sym][move]] += 1
+        if ply % 2 == 0:
+            x_bits |= prog1n2.CELL_BITS[move]
+        else:
+            o_bits |= prog1n2.CELL_BITS[move]
+    index, _ = prog1n2.canonical_index(x_bits, o_bits)
+    counts[index * 12 + column] += 1
+
+
+def build_index(record_paths, index_path=INDEX_FILE):
+    """Merge games not yet indexed from record_paths - returns games added"""
+    counts = load_counts(index_path)
+    sources = {}
+    if os.path.exists(sources_path(index_path)):
+        with open(sources_path(index_path)) as f:
+            sources = json.load(f)
+
+    added = 0
+    for path in record_paths:
+        key = os.path.abspath(path)
+        offset = sources.get(key)
+        with GameRecordReader(path) as reader:
+            if offset is None or offset > len(reader.view):
+                offset = FIRST_FRAME  # New or rewritten file: read it all
+            for mode, result, _, moves in reader.iter_from(offset):
+                offset += FRAME_HEADER.size + len(moves)
+                if mode in INDEXED_MODES and 1 <= result <= 3 and all(m < 9 for m in moves):
+                    add_game(counts, result, moves)
+                    added += 1
+        sources[key] = offset
+
+    # Write both files beside the originals, then swap them in
+    with open(index_path + ".tmp", "wb") as f:
+        f.write(MAGIC)
+        counts.tofile(f)
+    with open(sources_path(index_path) + ".tmp", "w") as f:
+        json.dump(sources, f, indent=2)
+    os.replace(index_path + ".tmp", index_path)
+    os.replace(sources_path(index_path) + ".tmp", sources_path(index_path))
+    return added
+
+
+class OpeningIndex:
+    """Memory-mapped, O(1) lookups into a built opening index"""
+
+    def __init__(self, index_path=INDEX_FILE):
+        with open(index_path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"{index_path} is not an opening index")
+
+    def lookup(self, x_bits, o_bits):
+        """(x_wins, o_wins, draws, next-move counts per cell) for a position"""
+        index, sym = prog1n2.canonical_index(x_bits, o_bits)
+        entry = ENTRY.unpack_from(self.map, len(MAGIC) + index * ENTRY.size)
+        # Map the next-move counts back from the canonical frame
+        perm = prog1n2.SYMMETRIES[sym]
+        next_moves = [entry[3 + perm[cell]] for cell in range(9)]
+        return entry[0], entry[1], entry[2], next_moves
+
+    def close(self):
+        self.map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the opening statistics index")
+    parser.add_argument("--index", default=INDEX_FILE, help="index file to update or query")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="merge new games from record files into the index")
+    build.add_argument("records", nargs="+")
+    query = sub.add_parser("query", help="show statistics for positions given as 0/1/2 grids")
+    query.add_argument("boards", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        added = build_index(args.records, args.index)
+        seconds = time.perf_counter() - start
+        print(f"Indexed {added} new games in {seconds:.2f}s ({added / max(seconds, 1e-9):,.0f} games/s)")
+        return
+
+    index = OpeningIndex(args.index)
+    for position in prog1n2.read_positions(args.boards):
+        if isinstance(position, str):
+            print(position)
+            continue
+        x_wins, o_wins, draws, next_moves = index.lookup(*position)
+        total = x_wins + o_wins + draws
+        print(f"games {total}: X wins {x_wins}, O wins {o_wins}, draws {draws}")
+        for cell in sorted(range(9), key=lambda c: -next_moves[c]):
+            if next_moves[cell]:
+                print(f"  {prog1n2.convert_to_text(cell // 3, cell % 3):>13}: {next_moves[cell]}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
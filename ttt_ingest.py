@@ -0,0 +1,106 @@
+import argparse
+import functools
+import sys
+import time
+
+import prog1n2
+from ttt_records import MODE_HUMAN, GameRecordWriter
+
+# Transcripts hold one game per line: text moves in the convert_move grammar
+# separated by commas or semicolons, X first. Blank lines and lines starting
+# with '#' are skipped. Every accepted game becomes one record frame.
+REJECT_REASONS = ("bad_move", "taken_space", "after_end", "unfinished")
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_move(text):
+    """Cell index for one move's text, or -1
+
+    Keyed on the raw text: archives repeat a handful of spellings, so
+    nearly every move is a cache hit without any normalizing first.
+    """
+    row, col = prog1n2.convert_move(text)
+    if row == -1 or col == -1:
+        return -1
+    return row * 3 + col
+
+
+def parse_game(line):
+    """Validate one transcript line - returns (result, cells) or a reason from REJECT_REASONS"""
+    parse = parse_move
+    cell_bits = prog1n2.CELL_BITS
+    is_win = prog1n2.IS_WIN
+    bits = [0, 0]
+    cells = []
+    result = 0
+    for text in line.replace(";", ",").split(","):
+        if result:
+            return "after_end"
+        cell = parse(text)
+        if cell == -1:
+            return "bad_move"
+        bit = cell_bits[cell]
+        if (bits[0] | bits[1]) & bit:
+            return "taken_space"
+        side = len(cells) & 1
+        bits[side] |= bit
+        cells.append(cell)
+        if is_win[bits[side]]:
+            result = side + 1
+        elif len(cells) == 9:
+            result = 3
+    if not result:
+        return "unfinished"
+    return result, cells
+
+
+def ingest(lines, writer):
+    """Parse transcript lines into writer - returns (games, moves, rejects by reason)"""
+    rejects = dict.fromkeys(REJECT_REASONS, 0)
+    games = 0
+    moves = 0
+    timestamp = int(time.time())
+    for line in lines:
+        if not line.strip() or line.startswith("#"):
+            continue
+        parsed = parse_game(line)
+        if isinstance(parsed, str):
+            rejects[parsed] += 1
+            continue
+        result, cells = parsed
+        writer.write(MODE_HUMAN, result, cells, timestamp)
+        games += 1
+        moves += len(cells)
+    return games, moves, rejects
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert text game transcripts into game records")
+    parser.add_argument("output", help="record file to append to")
+    parser.add_argument("transcripts", nargs="*", help="transcript files (default: stdin)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games = 0
+    moves = 0
+    rejects = dict.fromkeys(REJECT_REASONS, 0)
+    with GameRecordWriter(args.output) as writer:
+        for path in args.transcripts or ["-"]:
+            with (open(path, encoding="utf-8", errors="replace") if path != "-" else sys.stdin) as f:
+                file_games, file_moves, file_rejects = ingest(f, writer)
+            games += file_games
+            moves += file_moves
+            for reason, count in file_rejects.items():
+                rejects[reason] += count
+    seconds = max(time.perf_counter() - start, 1e-9)
+
+    print(f"Accepted {games} games, {moves} moves in {seconds:.2f}s "
+          f"({games / seconds:,.0f} games/s, {moves / seconds:,.0f} moves/s)")
+    print(f"Rejected {sum(rejects.values())}: "
+          + ", ".join(f"{reason} {count}" for reason, count in rejects.items()))
+    info = parse_move.cache_info()
+    print(f"Move text cache: {info.hits} hits, {info.misses} misses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+
+# Opt-in call timing for the AI functions. Set TTT_PROFILE=1 to print a
+# summary to stderr at exit, or TTT_PROFILE=<path> to write it as JSON.
+# When it is unset nothing is wrapped, so there is no overhead at all.
+PROFILE_ENV = "TTT_PROFILE"
+
+# Game phase by number of marks on the board
+PHASES = ((2, "opening"), (5, "middlegame"), (9, "endgame"))
+
+# (function name, phase) -> [calls, total_ns, {log2 bucket: calls}]
+_stats = {}
+_installed = False
+
+
+def _marks(args):
+    """Marks on the board passed to a list-of-lists or (own, other) bitboard function"""
+    if not args:
+        return 0
+    if isinstance(args[0], list):
+        return sum(1 for row in args[0] for v in row if v)
+    if len(args) > 1 and isinstance(args[0], int) and isinstance(args[1], int):
+        return bin(args[0] | args[1]).count("1")
+    return 0
+
+
+def _phase(marks):
+    for limit, name in PHASES:
+        if marks <= limit:
+            return name
+    return PHASES[-1][1]
+
+
+def _timed(name, func):
+    perf_counter_ns = time.perf_counter_ns
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter_ns() - start
+            key = (name, _phase(_marks(args)))
+            entry = _stats.get(key)
+            if entry is None:
+                entry = _stats[key] = [0, 0, {}]
+            entry[0] += 1
+            entry[1] += elapsed
+            bucket = elapsed.bit_length()
+            entry[2][bucket] = entry[2].get(bucket, 0) + 1
+    return wrapper
+
+
+def instrument_functions(namespace, names):
+    """Wrap namespace[name] for each name if profiling is enabled
+
+    Call with a module's globals() after its functions are defined, so calls
+    between the module's own functions are timed as well.
+    """
+    global _installed
+    if not os.environ.get(PROFILE_ENV):
+        return
+    module = os.path.splitext(os.path.basename(namespace.get("__file__", "")))[0] or namespace["__name__"]
+    for name in names:
+        namespace[name] = _timed(f"{module}.{name}", namespace[name])
+    if not _installed:
+        _installed = True
+        atexit.register(export_summary)
+
+
+def _bucket_percentile(buckets, calls, pct):
+    """Upper bound in ns of the bucket holding the pct-th percentile"""
+    target = calls * pct / 100
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= target:
+            return 1 << bucket
+    return 0
+
+
+def summary():
+    """Per function and phase: calls, total/mean time and latency histogram"""
+    result = {}
+    for (name, phase), (calls, total_ns, buckets) in sorted(_stats.items()):
+        result.setdefault(name, {})[phase] = {
+            "calls": calls,
+            "total_ms": total_ns / 1e6,
+            "mean_us": total_ns / calls / 1e3,
+            "p50_us_max": _bucket_percentile(buckets, calls, 50) / 1e3,
+            "p99_us_max": _bucket_percentile(buckets, calls, 99) / 1e3,
+            # Calls per power-of-two latency bucket, keyed by upper bound in ns
+            "histogram_ns": {str(1 << b): n for b, n in sorted(buckets.items())},
+        }
+    return result
+
+
+def export_summary():
+    target = os.environ.get(PROFILE_ENV)
+    data = summary()
+    if target and target != "1":
+        with open(target, "w") as f:
+            json.dump(data, f, indent=2)
+        return
+    print("\nAI timing summary", file=sys.stderr)
+    print(f"{'function':>32} {'phase':>11} {'calls':>8} {'total ms':>10} {'mean us':>9} {'p99 us <=':>10}",
+          file=sys.stderr)
+    for name, phases in data.items():
+        for phase, s in phases.items():
+            print(f"{name:>32} {phase:>11} {s['calls']:8d} {s['total_ms']:10.2f} "
+                  f"{s['mean_us']:9.1f} {s['p99_us_max']:10.1f}", file=sys.stderr)
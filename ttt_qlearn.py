@@ -0,0 +1,183 @@
+import argparse
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import prog1n2
+
+# Q-values for the side to move, one float32 per (base-3 board index, cell).
+# The file is MAGIC followed by the raw array, so loading is a single read.
+MAGIC = b"TTTQ\x01"
+Q_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ttt_qtable.bin")
+Q_SIZE = prog1n2.TABLE_SIZE * 9
+
+_q_table = None
+
+
+def new_table():
+    return array("f", bytes(Q_SIZE * 4))
+
+
+def save_table(table, path=Q_TABLE_FILE):
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC)
+        table.tofile(f)
+    os.replace(path + ".tmp", path)
+
+
+def load_table(path=Q_TABLE_FILE):
+    table = array("f")
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a Q-table")
+        table.fromfile(f, Q_SIZE)
+    return table
+
+
+def best_cell(table, index, empty_cells):
+    base = index * 9
+    return max(empty_cells, key=lambda c: table[base + c])
+
+
+def get_qlearning_move_bits(own, other):
+    """Greedy move from the trained Q-table - returns a cell index"""
+    global _q_table
+    if _q_table is None:
+        _q_table = load_table()
+    # X moves first, so equal counts means own is X
+    if len(prog1n2.MASK_CELLS[own]) == len(prog1n2.MASK_CELLS[other]):
+        index = prog1n2.board_index(own, other)
+    else:
+        index = prog1n2.board_index(other, own)
+    empty = prog1n2.MASK_CELLS[prog1n2.FULL_BOARD & ~(own | other)]
+    return best_cell(_q_table, index, empty)
+
+
+def train_shard(table_bytes, episodes, alpha, epsilon, seed):
+    """Run self-play episodes on a copy of the table - returns its bytes
+
+    Both sides share the table. A move's target is 1 for a win, 0 for a
+    draw, and otherwise minus the opponent's best Q-value in the resulting
+    position.
+    """
+    table = array("f")
+    table.frombytes(table_bytes)
+    rng = random.Random(seed)
+    ternary = prog1n2.TERNARY
+    mask_cells = prog1n2.MASK_CELLS
+    is_win = prog1n2.IS_WIN
+    cell_bits = prog1n2.CELL_BITS
+    full = prog1n2.FULL_BOARD
+    for _ in range(episodes):
+        bits = [0, 0]
+        side = 0
+        index = 0
+        while True:
+            empty = mask_cells[full & ~(bits[0] | bits[1])]
+            if rng.random() < epsilon:
+                cell = rng.choice(empty)
+            else:
+                cell = best_cell(table, index, empty)
+            slot = index * 9 + cell
+            bits[side] |= cell_bits[cell]
+            next_index = ternary[bits[0]] + 2 * ternary[bits[1]]
+            if is_win[bits[side]]:
+                target = 1.0
+            elif len(empty) == 1:
+                target = 0.0
+            else:
+                next_empty = mask_cells[full & ~(bits[0] | bits[1])]
+                base = next_index * 9
+                target = -max(table[base + c] for c in next_empty)
+            table[slot] += alpha * (target - table[slot])
+            if target == 1.0 or len(empty) == 1:
+                break
+            index = next_index
+            side = 1 - side
+    return table.tobytes()
+
+
+def merge_tables(shards):
+    """Average the shard tables element-wise"""
+    merged = array("f", shards[0])
+    for shard in shards[1:]:
+        other = array("f", shard)
+        for i in range(Q_SIZE):
+            merged[i] += other[i]
+    if len(shards) > 1:
+        scale = 1 / len(shards)
+        for i in range(Q_SIZE):
+            merged[i] *= scale
+    return merged
+
+
+def train(episodes, workers, sync_every, alpha, epsilon, seed, table=None):
+    """Parallel self-play training - returns (table, episodes per second)
+
+    Each round, every worker plays sync_every episodes on its own copy of
+    the table, and the copies are averaged into the next round's table.
+    """
+    table = table or new_table()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    played = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while played < episodes:
+            per_worker = min(sync_every, -(-(episodes - played) // workers))
+            data = table.tobytes()
+            futures = [pool.submit(train_shard, data, per_worker, alpha, epsilon, rng.getrandbits(32))
+                       for _ in range(workers)]
+            table = merge_tables([f.result() for f in futures])
+            played += per_worker * workers
+            rate = played / (time.perf_counter() - start)
+            print(f"{played:>10,d} episodes  {rate:10,.0f} episodes/s")
+    return table, played / (time.perf_counter() - start)
+
+
+def evaluate(table, games, seed):
+    """Results of the greedy Q policy as O against random and perfect X"""
+    rng = random.Random(seed)
+    for name in ("random", "perfect"):
+        results = [0, 0, 0, 0]
+        for _ in range(games):
+            bits = [0, 0]
+            side = 0
+            while not prog1n2.check_winner_bits(bits[0], bits[1]):
+                own, other = bits[side], bits[1 - side]
+                if side == 1:
+                    index = prog1n2.board_index(bits[0], bits[1])
+                    cell = best_cell(table, index, prog1n2.MASK_CELLS[prog1n2.FULL_BOARD & ~(own | other)])
+                elif name == "random":
+                    cell = rng.choice(prog1n2.MASK_CELLS[prog1n2.FULL_BOARD & ~(own | other)])
+                else:
+                    cell = prog1n2.get_computer_move_bits(own, other)
+                bits[side] |= prog1n2.CELL_BITS[cell]
+                side = 1 - side
+            results[prog1n2.check_winner_bits(bits[0], bits[1])] += 1
+        print(f"Q as O vs {name} X: O wins {results[2]}, draws {results[3]}, X wins {results[1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the tabular Q-learning tic-tac-toe agent")
+    parser.add_argument("--episodes", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sync-every", type=int, default=50000, help="episodes per worker between merges")
+    parser.add_argument("--alpha", type=float, default=0.3)
+    parser.add_argument("--epsilon", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resume", action="store_true", help="continue from the saved table")
+    parser.add_argument("--output", default=Q_TABLE_FILE)
+    args = parser.parse_args()
+
+    table = load_table(args.output) if args.resume else None
+    table, rate = train(args.episodes, args.workers, args.sync_every, args.alpha,
+                        args.epsilon, args.seed, table)
+    save_table(table, args.output)
+    print(f"Saved {args.output} ({rate:,.0f} episodes/s)")
+    evaluate(table, 1000, args.seed)
+
+
+if __name__ == "__main__":
+    main()
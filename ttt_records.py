@@ -0,0 +1,139 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+
+# File layout: MAGIC, then one frame per game:
+#   u16 length   bytes that follow in this frame (FRAME_HEADER.size - 2 + moves)
+#   u8  mode     game mode (the console menu numbers below)
+#   u8  result   check_winner code: 1 X wins, 2 O wins, 3 draw
+#   u32 time     unix timestamp of the end of the game
+#   u8  moves[]  one cell index per move, X first (board * 9 + cell in Ultimate,
+#                layer * 16 + row * 4 + col in Qubic)
+# All integers are little-endian.
+MAGIC = b"TTTR\x01"
+FIRST_FRAME = len(MAGIC)  # Offset of the first frame
+FRAME_HEADER = struct.Struct("<HBBI")
+MAX_MOVES = 0xFFFF - (FRAME_HEADER.size - 2)
+
+MODE_HUMAN = 1
+MODE_COMPUTER = 2
+MODE_ULTIMATE = 3
+MODE_QUBIC = 4
+
+RECORD_FILE_ENV = "TTT_RECORD_FILE"
+
+
+class GameRecordWriter:
+    """Buffered, append-only writer of game records"""
+
+    def __init__(self, path, buffer_size=1 << 20):
+        self.file = open(path, "ab", buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write(self, mode, result, moves, timestamp=None):
+        if len(moves) > MAX_MOVES:
+            raise ValueError(f"a record holds at most {MAX_MOVES} moves")
+        if timestamp is None:
+            timestamp = int(time.time())
+        self.file.write(FRAME_HEADER.pack(FRAME_HEADER.size - 2 + len(moves), mode, result, timestamp))
+        self.file.write(bytes(moves))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameRecordReader:
+    """Memory-mapped reader yielding (mode, result, timestamp, moves)
+
+    moves is a memoryview into the mapped file, not a copy. Use bytes(moves)
+    to keep the moves beyond the current iteration.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.view = memoryview(self.map) if self.map else memoryview(b"")
+        if size and self.view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a game record file")
+
+    def __iter__(self):
+        return self.iter_from(FIRST_FRAME)
+
+    def iter_from(self, offset):
+        """Iterate over the frames starting at byte offset
+
+        Each frame occupies FRAME_HEADER.size + len(moves) bytes, which lets
+        callers track where to resume later.
+        """
+        view = self.view
+        unpack_from = FRAME_HEADER.unpack_from
+        header_size = FRAME_HEADER.size
+        end = len(view)
+        # A frame cut short by a crash mid-write is ignored
+        while offset + header_size <= end:
+            length, mode, result, timestamp = unpack_from(view, offset)
+            next_offset = offset + 2 + length
+            if next_offset > end:
+                break
+            yield mode, result, timestamp, view[offset + header_size:next_offset]
+            offset = next_offset
+
+    def close(self):
+        self.view.release()
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass  # Moves views still alive; the map closes when they go
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def record_game(mode, result, moves):
+    """Append one game to $TTT_RECORD_FILE, if set (used by prog1n2 and prog3)"""
+    path = os.environ.get(RECORD_FILE_ENV)
+    if path:
+        with GameRecordWriter(path, buffer_size=4096) as writer:
+            writer.write(mode, result, moves)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a game record file")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games = 0
+    moves = 0
+    results = [0, 0, 0, 0]
+    with GameRecordReader(args.path) as reader:
+        for _, result, _, game_moves in reader:
+            games += 1
+            moves += len(game_moves)
+            results[result & 3] += 1
+    seconds = time.perf_counter() - start
+    print(f"{games} games, {moves} moves in {seconds:.2f}s ({games / max(seconds, 1e-9):,.0f} games/s)")
+    print(f"X wins {results[1]}, O wins {results[2]}, draws {results[3]}")
+
+
+if __name__ == "__main__":
+    main()
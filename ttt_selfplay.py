@@ -0,0 +1,130 @@
+import argparse
+import time
+
+import numpy as np
+
+import prog1n2
+
+CENTER = 4
+CORNERS = [0, 2, 6, 8]
+STRATEGIES = ("random", "greedy", "center_corner", "perfect")
+
+_perfect_moves = None
+
+
+def perfect_moves():
+    """Solved-table move for every base-3 board index (-1 where there is none)"""
+    global _perfect_moves
+    if _perfect_moves is None:
+        moves = np.full(prog1n2.TABLE_SIZE, -1, dtype=np.int8)
+        for index in range(prog1n2.TABLE_SIZE):
+            x_bits = 0
+            o_bits = 0
+            rest = index
+            for cell in range(9):
+                digit = rest % 3
+                rest //= 3
+                if digit == 1:
+                    x_bits |= prog1n2.CELL_BITS[cell]
+                elif digit == 2:
+                    o_bits |= prog1n2.CELL_BITS[cell]
+            x_count = len(prog1n2.MASK_CELLS[x_bits])
+            o_count = len(prog1n2.MASK_CELLS[o_bits])
+            if x_count - o_count not in (0, 1) or prog1n2.check_winner_bits(x_bits, o_bits):
+                continue
+            if x_count == o_count:
+                moves[index] = prog1n2.get_computer_move_bits(x_bits, o_bits)
+            else:
+                moves[index] = prog1n2.get_computer_move_bits(o_bits, x_bits)
+        _perfect_moves = moves
+    return _perfect_moves
+
+
+def random_cells(allowed, rng):
+    """A uniformly random allowed cell per row (-1 where none is allowed)"""
+    keys = rng.random(allowed.shape)
+    keys[~allowed] = -1.0
+    cells = keys.argmax(axis=1)
+    return np.where(allowed.any(axis=1), cells, -1)
+
+
+def choose_moves(strategy, boards, win_cell, block_cell, rng):
+    """Vectorized move choice for every board in the batch"""
+    empty = boards == 0
+    if strategy == "perfect":
+        index = boards.astype(np.int32) @ np.array(prog1n2.POW3, dtype=np.int32)
+        return perfect_moves()[index].astype(np.intp)
+
+    moves = random_cells(empty, rng)
+    if strategy == "random":
+        return moves
+    if strategy == "center_corner":
+        # prog3: center, then a random corner, then anything
+        corner = np.zeros_like(empty)
+        corner[:, CORNERS] = empty[:, CORNERS]
+        corner_moves = random_cells(corner, rng)
+        moves = np.where(corner_moves != -1, corner_moves, moves)
+        moves = np.where(empty[:, CENTER], CENTER, moves)
+    # Both heuristics win first, then block
+    moves = np.where(block_cell != -1, block_cell, moves)
+    moves = np.where(win_cell != -1, win_cell, moves)
+    return moves
+
+
+def play_batch(x_strategy, o_strategy, games, rng):
+    """Play games in lockstep - returns counts of check_winner results"""
+    boards = np.zeros((games, 9), dtype=np.int8)
+    results = np.zeros(games, dtype=np.int8)
+    active = np.arange(games)
+    strategies = (x_strategy, o_strategy)
+    rows = np.arange(games)
+    for ply in range(10):
+        sub = boards[active]
+        status, _, win_cell, block_cell = prog1n2.evaluate_boards(sub)
+        finished = status != 0
+        results[active[finished]] = status[finished]
+        active = active[~finished]
+        if len(active) == 0:
+            break
+        sub = sub[~finished]
+        moves = choose_moves(strategies[ply % 2], sub, win_cell[~finished],
+                             block_cell[~finished], rng)
+        sub[rows[:len(sub)], moves] = ply % 2 + 1
+        boards[active] = sub
+    return np.bincount(results, minlength=4)
+
+
+def simulate(x_strategy, o_strategy, games, batch_size=1 << 18, seed=0):
+    """Play games between two strategies - returns (counts, seconds)"""
+    rng = np.random.default_rng(seed)
+    if "perfect" in (x_strategy, o_strategy):
+        perfect_moves()  # Build the lookup outside the timed loop
+    counts = np.zeros(4, dtype=np.int64)
+    start = time.perf_counter()
+    for done in range(0, games, batch_size):
+        counts += play_batch(x_strategy, o_strategy, min(batch_size, games - done), rng)
+    return counts, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless tic-tac-toe self-play")
+    parser.add_argument("--x", choices=STRATEGIES, help="strategy playing X (default: all)")
+    parser.add_argument("--o", choices=STRATEGIES, help="strategy playing O (default: all)")
+    parser.add_argument("--games", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=1 << 18)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    x_list = [args.x] if args.x else STRATEGIES
+    o_list = [args.o] if args.o else STRATEGIES
+    print(f"{'X':>14} {'O':>14} {'X win':>8} {'O win':>8} {'draw':>8} {'games/s':>12}")
+    for x_strategy in x_list:
+        for o_strategy in o_list:
+            counts, seconds = simulate(x_strategy, o_strategy, args.games, args.batch_size, args.seed)
+            total = counts.sum()
+            print(f"{x_strategy:>14} {o_strategy:>14} {counts[1] / total:8.2%} "
+                  f"{counts[2] / total:8.2%} {counts[3] / total:8.2%} {total / seconds:12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import random
+import time
+
+import prog1n2
+
+# Line protocol. The client sends the game mode ("1" or "2"), then moves in
+# the convert_move grammar ("top left", "mid mid", ...), or "quit". The
+# server answers with:
+#   MODE?                     choose 1 (Human vs Human) or 2 (Human vs Computer)
+#   TURN <player>             waiting for player's move
+#   MOVE <player> <text>      a move was played (human or computer)
+#   BOARD <9 chars>           board after the move, rows top to bottom, X/O/.
+#   ERROR <message>           input rejected, the same player moves again
+#   RESULT <1|2|3>            game over (check_winner codes), then close
+IDLE_TIMEOUT = 300
+MAX_LINE = 256
+
+
+def board_text(game):
+    x_bits, o_bits = game.bits
+    return "".join("X" if x_bits >> i & 1 else "O" if o_bits >> i & 1 else "." for i in range(9))
+
+
+class GameServer:
+    """Runs any number of console-rule games on one event loop"""
+
+    def __init__(self):
+        self.active = 0
+        self.sessions = 0
+
+    async def handle(self, reader, writer):
+        self.active += 1
+        self.sessions += 1
+        try:
+            await self.play(reader, writer)
+        except (asyncio.TimeoutError, ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+    async def read_line(self, reader):
+        line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        if not line:
+            raise ConnectionResetError("client closed the connection")
+        return line.decode("utf-8", "replace").strip()
+
+    async def play(self, reader, writer):
+        while True:
+            writer.write(b"MODE?\n")
+            choice = await self.read_line(reader)
+            if choice in ("1", "2"):
+                mode = int(choice)
+                break
+            writer.write(b"ERROR choose 1 or 2\n")
+
+        game = prog1n2.GameState()
+        lines = []
+        while not game.winner:
+            player = game.to_move
+            if mode == 2 and player == 2:
+                cell = prog1n2.get_computer_move_bits(game.bits[1], game.bits[0])
+            else:
+                lines.append(f"TURN {player}\n")
+                writer.write("".join(lines).encode())
+                lines.clear()
+                await writer.drain()
+                text = await self.read_line(reader)
+                if text.lower() == "quit":
+                    return
+                row, col = prog1n2.convert_move(text)
+                if row == -1 or col == -1:
+                    lines.append("ERROR use a move like 'top left', 'mid mid', 'bottom right'\n")
+                    continue
+                cell = row * 3 + col
+                if not game.is_empty(cell):
+                    lines.append("ERROR that space is already taken\n")
+                    continue
+            game.make(cell)
+            lines.append(f"MOVE {player} {prog1n2.convert_to_text(cell // 3, cell % 3)}\n")
+            lines.append(f"BOARD {board_text(game)}\n")
+        lines.append(f"RESULT {game.winner}\n")
+        writer.write("".join(lines).encode())
+        await writer.drain()
+
+
+async def serve(host, port):
+    server = GameServer()
+    listener = await asyncio.start_server(server.handle, host, port, limit=MAX_LINE)
+    print(f"Serving tic-tac-toe on {host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+async def run_session(host, port, rng, latencies):
+    """Play one Human vs Computer game with random legal moves"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        board = ["."] * 9
+        sent = None
+        while True:
+            line = (await reader.readline()).decode().strip()
+            if not line:
+                raise ConnectionResetError("server closed the connection")
+            kind, _, rest = line.partition(" ")
+            if kind == "MODE?":
+                writer.write(b"2\n")
+            elif kind == "BOARD":
+                board = list(rest)
+            elif kind in ("TURN", "RESULT"):
+                if sent is not None:
+                    latencies.append(time.perf_counter() - sent)
+                if kind == "RESULT":
+                    return int(rest)
+                cell = rng.choice([i for i in range(9) if board[i] == "."])
+                writer.write(f"{prog1n2.convert_to_text(cell // 3, cell % 3)}\n".encode())
+                sent = time.perf_counter()
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, sessions, concurrency, seed):
+    rng = random.Random(seed)
+    latencies = []
+    results = [0, 0, 0, 0]
+    errors = 0
+    remaining = iter(range(sessions))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            try:
+                results[await run_session(host, port, rng, latencies)] += 1
+            except (ConnectionError, OSError, ValueError):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    completed = sum(results)
+    print(f"{completed} sessions in {seconds:.2f}s ({completed / seconds:,.0f} sessions/s), "
+          f"{errors} errors")
+    print(f"X wins {results[1]}, O wins {results[2]}, draws {results[3]}")
+    if latencies:
+        for pct in (50, 90, 99):
+            value = latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+            print(f"move round trip p{pct}: {value * 1000:.2f} ms")
+        print(f"move round trip max: {latencies[-1] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-session tic-tac-toe server and load generator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9393)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("serve", help="run the game server")
+    load = sub.add_parser("load", help="run Human vs Computer sessions against a server")
+    load.add_argument("--sessions", type=int, default=10000)
+    load.add_argument("--concurrency", type=int, default=200)
+    load.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "serve":
+            asyncio.run(serve(args.host, args.port))
+        else:
+            asyncio.run(load_test(args.host, args.port, args.sessions, args.concurrency, args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
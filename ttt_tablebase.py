@@ -0,0 +1,135 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import prog1n2
+
+# Retrograde solver for every 4x4 position. Positions are numbered by their
+# base-3 index (cell i weighs 3 ** i, empty 0, X 1, O 2) and each gets two
+# bits in the table: see prog1n2.TB_LOSS/TB_DRAW/TB_WIN, 0 for illegal.
+# Every child of a position has one more mark, so solving layers from 16
+# marks down to 0 only ever reads finished layers.
+CELLS = 16
+POSITIONS = 3 ** CELLS
+CHUNK_SIZE = 1 << 18  # Multiple of 4, so chunks never share a table byte
+POW3 = np.array([3 ** i for i in range(CELLS)], dtype=np.int64)
+
+
+def line_cells(k):
+    engine = prog1n2.KInARowEngine(4, k)
+    return np.array([[c for c in range(CELLS) if m >> c & 1] for m in engine.lines])
+
+
+def solve_chunk(path, k, layer, start, end):
+    """Solve the positions with `layer` marks whose index is in [start, end)"""
+    index = np.arange(start, end, dtype=np.int64)
+    cells = ((index[:, None] // POW3) % 3).astype(np.int8)
+    x = cells == 1
+    o = cells == 2
+    x_count = x.sum(axis=1)
+    o_count = o.sum(axis=1)
+    keep = (x_count + o_count == layer) & ((x_count == o_count) | (x_count == o_count + 1))
+    if not keep.any():
+        return 0
+    index, cells, x, o = index[keep], cells[keep], x[keep], o[keep]
+    x_to_move = x_count[keep] == o_count[keep]
+
+    lines = line_cells(k)
+    x_win = x[:, lines].all(axis=2).any(axis=1)
+    o_win = o[:, lines].all(axis=2).any(axis=1)
+    values = np.zeros(len(index), dtype=np.uint8)
+    # The player who just moved has a line: the side to move has lost.
+    # If the side to move has a line the game should already have ended.
+    mover_won = np.where(x_to_move, o_win & ~x_win, x_win & ~o_win)
+    values[mover_won] = prog1n2.TB_LOSS
+    open_game = ~(x_win | o_win)
+
+    table = np.memmap(path, dtype=np.uint8, mode="r+")
+    if layer == CELLS:
+        values[open_game] = prog1n2.TB_DRAW
+    else:
+        best = np.zeros(len(index), dtype=np.uint8)  # 0 none, 1 draw, 2 win
+        child_mark = np.where(x_to_move, 1, 2)
+        for cell in range(CELLS):
+            playable = open_game & (cells[:, cell] == 0)
+            child = index[playable] + child_mark[playable] * POW3[cell]
+            child_value = (table[child >> 2] >> ((child & 3) * 2).astype(np.uint8)) & 3
+            # A child lost for the opponent is a win for us, and so on
+            outcome = np.where(child_value == prog1n2.TB_LOSS, 2,
+                               np.where(child_value == prog1n2.TB_DRAW, 1, 0)).astype(np.uint8)
+            best[playable] = np.maximum(best[playable], outcome)
+        values[open_game] = np.array([prog1n2.TB_LOSS, prog1n2.TB_DRAW, prog1n2.TB_WIN],
+                                     dtype=np.uint8)[best[open_game]]
+
+    # Pack into this chunk's own bytes; OR-ing keeps re-runs idempotent
+    packed = np.zeros((end - start + 3) // 4, dtype=np.uint8)
+    offset = index - start
+    np.bitwise_or.at(packed, offset >> 2, values << ((offset & 3) * 2).astype(np.uint8))
+    table[start >> 2:(end + 3) >> 2] |= packed
+    table.flush()
+    return len(index)
+
+
+def load_progress(progress_path):
+    done = set()
+    if os.path.exists(progress_path):
+        with open(progress_path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    done.add((int(parts[0]), int(parts[1])))
+    return done
+
+
+def build(k, workers, chunk_size=CHUNK_SIZE):
+    """Build (or resume building) the 4x4 tablebase for k in a row"""
+    path = prog1n2.tablebase_path(k)
+    partial = path + ".partial"
+    progress_path = path + ".progress"
+    if os.path.exists(path):
+        print(f"{path} already exists")
+        return
+    if not os.path.exists(partial):
+        with open(partial, "wb") as f:
+            f.truncate((POSITIONS + 3) // 4)
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+    done = load_progress(progress_path)
+    if done:
+        print(f"Resuming with {len(done)} chunks already solved")
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(progress_path, "a") as progress:
+        for layer in range(CELLS, -1, -1):
+            layer_start = time.perf_counter()
+            futures = {}
+            for start in range(0, POSITIONS, chunk_size):
+                if (layer, start) not in done:
+                    end = min(start + chunk_size, POSITIONS)
+                    futures[start] = pool.submit(solve_chunk, partial, k, layer, start, end)
+            solved = 0
+            for start, future in futures.items():
+                solved += future.result()
+                # Only record a chunk once its bytes are flushed
+                progress.write(f"{layer} {start}\n")
+                progress.flush()
+            print(f"layer {layer:2d}: {solved:10,d} positions in {time.perf_counter() - layer_start:6.1f}s")
+
+    os.replace(partial, path)
+    os.remove(progress_path)
+    print(f"Wrote {path} in {time.perf_counter() - start_time:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the 4x4 tic-tac-toe tablebase")
+    parser.add_argument("-k", type=int, choices=(3, 4), default=4, help="marks in a row to win")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    build(args.k, args.workers)
+
+
+if __name__ == "__main__":
+    main()
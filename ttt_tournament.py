@@ -0,0 +1,240 @@
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import prog1n2
+import ttt_qlearn
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+try:
+    import prog3
+except ImportError:  # prog3 needs pygame
+    prog3 = None
+
+# Policies map (b, player) to a (row, col) move. They must be module-level
+# functions so the process pool can pickle them.
+POLICIES = {}
+
+ELO_SCALE = 400 / math.log(10)
+
+
+def register_policy(name):
+    """Decorator adding a move policy to the tournament"""
+    def register(func):
+        POLICIES[name] = func
+        return func
+    return register
+
+
+def _own_other(b, player):
+    x_bits, o_bits = prog1n2.board_to_bits(b)
+    return (x_bits, o_bits) if player == 1 else (o_bits, x_bits)
+
+
+@register_policy("random")
+def random_policy(b, player):
+    own, other = _own_other(b, player)
+    cell = random.choice(prog1n2.MASK_CELLS[prog1n2.FULL_BOARD & ~(own | other)])
+    return (cell // 3, cell % 3)
+
+
+@register_policy("prog1n2_greedy")
+def greedy_policy(b, player):
+    """prog1n2's original AI: win, block, random"""
+    cell = prog1n2.get_greedy_move_bits(*_own_other(b, player))
+    return (cell // 3, cell % 3)
+
+
+@register_policy("perfect")
+def perfect_policy(b, player):
+    """Solved-table play (get_computer_move in prog1n2 and prog3)"""
+    cell = prog1n2.get_computer_move_bits(*_own_other(b, player))
+    return (cell // 3, cell % 3)
+
+
+_engine = None
+
+
+@register_policy("engine_depth2")
+def engine_depth2_policy(b, player):
+    """KInARowEngine limited to a two-ply search"""
+    global _engine
+    if _engine is None:
+        _engine = prog1n2.KInARowEngine(3, 3)
+    return _engine.best_move(b, player, max_depth=2)
+
+
+if prog3 is not None:
+    @register_policy("prog3_center_corner")
+    def center_corner_policy(b, player):
+        """prog3's original AI: win, block, center, corner, random"""
+        if player == 1:
+            # The heuristic always plays O, so swap the marks for X
+            b = [[(3 - v) % 3 for v in row] for row in b]
+        return prog3.get_center_corner_move(b)
+
+
+if os.path.exists(ttt_qlearn.Q_TABLE_FILE):
+    @register_policy("qlearning")
+    def qlearning_policy(b, player):
+        """Greedy play from the table trained by ttt_qlearn.py"""
+        cell = ttt_qlearn.get_qlearning_move_bits(*_own_other(b, player))
+        return (cell // 3, cell % 3)
+
+
+def play_games(x_policy, o_policy, games, seed):
+    """Play games with fixed colors - returns (x_wins, o_wins, draws)"""
+    random.seed(seed)
+    results = [0, 0, 0, 0]
+    for _ in range(games):
+        b = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+        game = prog1n2.GameState()
+        while not game.winner:
+            policy = x_policy if game.to_move == 1 else o_policy
+            row, col = policy(b, game.to_move)
+            if b[row][col] != 0:
+                raise ValueError(f"{policy.__name__} played an occupied cell ({row}, {col})")
+            b[row][col] = game.to_move
+            game.make(row * 3 + col)
+        results[game.winner] += 1
+    return results[1], results[2], results[3]
+
+
+def fit_elo(names, scores, counts, iterations=200):
+    """Maximum-likelihood Elo ratings (mean 1500) from pairwise scores
+
+    scores[(a, b)] is a's total score (draws count half) in counts[(a, b)]
+    games against b.
+    """
+    ratings = {name: 0.0 for name in names}
+    for _ in range(iterations):
+        for name in names:
+            gradient = 0.0
+            curvature = 0.0
+            for (a, b), n in counts.items():
+                if a != name:
+                    continue
+                p = 1 / (1 + math.exp((ratings[b] - ratings[a]) / ELO_SCALE))
+                gradient += scores[(a, b)] - n * p
+                curvature += n * p * (1 - p)
+            if curvature:
+                ratings[name] += ELO_SCALE * gradient / curvature
+        mean = sum(ratings.values()) / len(ratings)
+        for name in names:
+            ratings[name] -= mean
+    return {name: 1500 + r for name, r in ratings.items()}
+
+
+def pairwise_scores(names, outcomes, prior_draws):
+    """Fold (x, o, x_wins, o_wins, draws) outcomes into per-pair score totals
+
+    Every pairing also gets prior_draws virtual draws so a policy that never
+    loses keeps a finite rating.
+    """
+    scores = {}
+    counts = {}
+    for a in names:
+        for b in names:
+            if a != b:
+                scores[(a, b)] = prior_draws / 2
+                counts[(a, b)] = prior_draws
+    for x, o, x_wins, o_wins, draws in outcomes:
+        games = x_wins + o_wins + draws
+        scores[(x, o)] += x_wins + draws / 2
+        scores[(o, x)] += o_wins + draws / 2
+        counts[(x, o)] += games
+        counts[(o, x)] += games
+    return scores, counts
+
+
+def bootstrap_intervals(names, outcomes, prior_draws, samples, seed):
+    """95% rating intervals from resampled per-game scores"""
+    rng = random.Random(seed)
+    fits = {name: [] for name in names}
+    for _ in range(samples):
+        resampled = []
+        for x, o, x_wins, o_wins, draws in outcomes:
+            games = x_wins + o_wins + draws
+            # Normal approximation of a multinomial resample of the games
+            mean = (x_wins + draws / 2) / games
+            var = (x_wins + draws / 4) / games - mean * mean
+            score = mean * games + rng.gauss(0, math.sqrt(max(var, 0) * games))
+            score = min(max(score, 0), games)
+            resampled.append((x, o, score, games - score, 0))
+        scores, counts = pairwise_scores(names, resampled, prior_draws)
+        for name, rating in fit_elo(names, scores, counts, iterations=50).items():
+            fits[name].append(rating)
+    intervals = {}
+    for name, values in fits.items():
+        values.sort()
+        intervals[name] = (values[int(0.025 * samples)], values[int(0.975 * samples) - 1])
+    return intervals
+
+
+def run_tournament(names, games, chunk_size, workers, seed):
+    """Round-robin with both colors - returns a list of pairing outcomes"""
+    tasks = []
+    for x in names:
+        for o in names:
+            if x == o:
+                continue
+            for start in range(0, games, chunk_size):
+                tasks.append((x, o, min(chunk_size, games - start)))
+    totals = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(x, o, pool.submit(play_games, POLICIES[x], POLICIES[o], n, seed + i))
+                   for i, (x, o, n) in enumerate(tasks)]
+        for x, o, future in futures:
+            x_wins, o_wins, draws = future.result()
+            total = totals.setdefault((x, o), [0, 0, 0])
+            total[0] += x_wins
+            total[1] += o_wins
+            total[2] += draws
+    return [(x, o, *total) for (x, o), total in totals.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin tournament between move policies")
+    parser.add_argument("policies", nargs="*", help=f"policies to include (default: all of {sorted(POLICIES)})")
+    parser.add_argument("--games", type=int, default=2000, help="games per pairing and color")
+    parser.add_argument("--chunk-size", type=int, default=250, help="games per worker task")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--bootstrap", type=int, default=200, help="resamples for the intervals")
+    parser.add_argument("--prior-draws", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    names = args.policies or sorted(POLICIES)
+    unknown = [name for name in names if name not in POLICIES]
+    if unknown:
+        parser.error(f"unknown policies: {', '.join(unknown)}")
+    if len(names) < 2:
+        parser.error("need at least two policies")
+
+    start = time.perf_counter()
+    outcomes = run_tournament(names, args.games, args.chunk_size, args.workers, args.seed)
+    seconds = time.perf_counter() - start
+    total_games = sum(x_wins + o_wins + draws for _, _, x_wins, o_wins, draws in outcomes)
+    print(f"{total_games} games in {seconds:.1f}s ({total_games / seconds:,.0f} games/s, "
+          f"{args.workers} workers)")
+    print()
+    print(f"{'X':>20} {'O':>20} {'X win':>7} {'O win':>7} {'draw':>7}")
+    for x, o, x_wins, o_wins, draws in sorted(outcomes):
+        games = x_wins + o_wins + draws
+        print(f"{x:>20} {o:>20} {x_wins / games:7.1%} {o_wins / games:7.1%} {draws / games:7.1%}")
+
+    scores, counts = pairwise_scores(names, outcomes, args.prior_draws)
+    ratings = fit_elo(names, scores, counts)
+    intervals = bootstrap_intervals(names, outcomes, args.prior_draws, args.bootstrap, args.seed)
+    print()
+    print(f"{'policy':>20} {'Elo':>7} {'95% interval':>17}")
+    for name in sorted(names, key=ratings.get, reverse=True):
+        low, high = intervals[name]
+        print(f"{name:>20} {ratings[name]:7.0f} {low:8.0f} - {high:<6.0f}")
+
+
+if __name__ == "__main__":
+    main()